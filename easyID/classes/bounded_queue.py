@@ -0,0 +1,113 @@
+# this is used for every hand-off between threads, so a stalled thread can't make memory grow forever
+from collections import deque
+from enum import Enum
+from queue import Empty
+from threading import Condition
+from typing import Any, Callable, Deque, Dict, Generic, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class DropPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"  # make room by throwing away the oldest item
+    DROP_NEWEST = "drop_newest"  # throw away the item being added
+    COALESCE = "coalesce"  # merge the item being added into the newest item
+    BLOCK = "block"  # wait until the consumer makes room
+
+
+class BoundedQueue(Generic[T]):
+    """
+    A thread safe FIFO queue with a maximum size and a policy for what happens when it's full.
+    It keeps counters of dropped / coalesced items and the highest size it reached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        policy: Union[DropPolicy, str],
+        coalesce: Optional[Callable[[T, T], T]] = None,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError(f"{name} queue needs room for at least one item")
+        self.name: str = name
+        self.maxsize: int = maxsize
+        self.policy: DropPolicy = DropPolicy(policy)
+        # merges (newest queued item, new item), by default the new item just replaces the newest one
+        self._coalesce: Callable[[T, T], T] = coalesce or (lambda old, new: new)
+        self._items: Deque[T] = deque()
+        self._condition: Condition = Condition()
+        self._closed: bool = False
+
+        self.puts: int = 0
+        self.drops: int = 0
+        self.coalesced: int = 0
+        self.high_water: int = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: T) -> bool:
+        """Adds an item, returns False if the item (or an older one) was dropped or merged to make room."""
+        with self._condition:
+            self.puts += 1
+            if len(self._items) >= self.maxsize:
+                if self.policy == DropPolicy.BLOCK:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        self.drops += 1
+                        return False
+                elif self.policy == DropPolicy.DROP_NEWEST:
+                    self.drops += 1
+                    return False
+                elif self.policy == DropPolicy.COALESCE:
+                    self._items[-1] = self._coalesce(self._items[-1], item)
+                    self.coalesced += 1
+                    return False
+                else:
+                    self._items.popleft()
+                    self.drops += 1
+                    self._items.append(item)
+                    self._condition.notify_all()
+                    return False
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._condition.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> T:
+        """Removes and returns the oldest item, raises queue.Empty if there is none within timeout seconds."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self._items) > 0, timeout):
+                raise Empty
+            item = self._items.popleft()
+            self._condition.notify_all()  # wake up blocked producers
+            return item
+
+    def get_nowait(self) -> T:
+        return self.get(timeout=0)
+
+    def close(self) -> None:
+        """Releases producers waiting on a full "block" queue, used on shutdown."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "policy": self.policy.value,
+            "puts": self.puts,
+            "drops": self.drops,
+            "coalesced": self.coalesced,
+            "high_water": self.high_water,
+        }
+
+    def stats_message(self) -> str:
+        return (
+            f"{self.name} queue ({self.policy.value}): {len(self._items)}/{self.maxsize}, "
+            f"high water {self.high_water}, {self.drops} dropped, {self.coalesced} coalesced of {self.puts}"
+        )
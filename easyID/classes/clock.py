@@ -0,0 +1,43 @@
+# the time as seen by the threads, the soak test swaps in an accelerated clock so minutes and days pass quickly
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+class Clock:
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class AcceleratedClock(Clock):
+    """A clock that runs speed times faster than real time, starting at start (default: now)."""
+
+    def __init__(self, speed: float, start: Optional[datetime] = None) -> None:
+        self.speed: float = speed
+        self._start: datetime = start or datetime.now()
+        self._real_start: float = time.monotonic()
+
+    def now(self) -> datetime:
+        return self._start + timedelta(seconds=(time.monotonic() - self._real_start) * self.speed)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds / self.speed)
+
+
+_clock: Clock = Clock()
+
+
+def now() -> datetime:
+    return _clock.now()
+
+
+def sleep(seconds: float) -> None:
+    _clock.sleep(seconds)
+
+
+def set_clock(clock: Clock) -> None:
+    global _clock
+    _clock = clock
@@ -0,0 +1,226 @@
+# this spreads recognize requests across one or more CompreFace servers
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from threading import Event, Lock, Thread
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+import requests
+from requests import RequestException
+
+from easyID.classes.recognition_client import RecognitionClient
+from easyID.settings import (
+    ENDPOINT_COOLDOWN,
+    ENDPOINT_HEALTH_INTERVAL,
+    ENDPOINT_HEDGE_PERCENTILE,
+    ENDPOINT_LATENCY_WINDOW,
+    ENDPOINT_MAX_FAILURES,
+    RECOGNITION_TIMEOUT,
+)
+
+HEALTH_CHECK_API = "/api/v1/recognition/faces?size=1"  # cheap request that needs a working api key and database
+
+
+@dataclass
+class Endpoint:
+    client: RecognitionClient
+    outstanding: int = 0  # requests currently in flight
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0  # monotonic time, the endpoint isn't used before this
+    requests: int = 0
+    errors: int = 0
+    hedges: int = 0  # requests this endpoint received as the second (hedged) try
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=ENDPOINT_LATENCY_WINDOW))
+
+    @property
+    def name(self) -> str:
+        return f"{self.client.host}:{self.client.port}"
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self.latencies) == 0:
+            return None
+        return float(np.percentile(self.latencies, percentile))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "outstanding": self.outstanding,
+            "p50": self.latency_percentile(50),
+            "p95": self.latency_percentile(95),
+            "p99": self.latency_percentile(99),
+            "ejected": not self.is_healthy(time.monotonic()),
+        }
+
+
+class EndpointPool:
+    """
+    Routes each request to the healthy endpoint with the fewest outstanding requests.
+    Endpoints are taken out of rotation after ENDPOINT_MAX_FAILURES consecutive failures (requests or health checks)
+    and are tried again after ENDPOINT_COOLDOWN seconds. If ENDPOINT_HEDGE_PERCENTILE is set, a request that takes
+    longer than that latency percentile is also sent to a second endpoint and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        hosts: List[str],
+        ports: List[str],
+        hedge_percentile: Optional[float] = ENDPOINT_HEDGE_PERCENTILE,
+    ) -> None:
+        if len(ports) == 1:  # one port for every host
+            ports = ports * len(hosts)
+        if len(hosts) == 0 or len(hosts) != len(ports):
+            raise ValueError(f"Expected one port or one port per host, got {len(hosts)} hosts and {len(ports)} ports")
+        self.endpoints: List[Endpoint] = [
+            Endpoint(RecognitionClient(api_key, host, port)) for host, port in zip(hosts, ports)
+        ]
+        self.hedge_percentile: Optional[float] = hedge_percentile
+        self._lock: Lock = Lock()
+        self._stop: Event = Event()
+        self._health_thread: Thread = Thread(target=self._health_check, name="HealthCheckThread", daemon=True)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if hedge_percentile is not None and len(self.endpoints) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=2 * len(self.endpoints), thread_name_prefix="Hedge")
+
+    def start(self) -> None:
+        self._health_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._health_thread.is_alive():
+            self._health_thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def recognize(self, image: bytes) -> Dict[str, Any]:
+        """Same as RecognitionClient.recognize, raises a requests.ConnectionError if every endpoint is out."""
+        primary = self._acquire()
+        try:
+            return self._hedged_call(primary, image)
+        except (requests.ConnectionError, requests.HTTPError):
+            # the server is down or broken (not just slow), so it's worth trying another one straight away
+            if len(self.endpoints) == 1:
+                raise
+            return self._hedged_call(self._acquire(exclude=primary), image)
+
+    def _hedged_call(self, primary: Endpoint, image: bytes) -> Dict[str, Any]:
+        if self._executor is None or self.hedge_percentile is None:
+            return self._call(primary, image)
+        hedge_after = primary.latency_percentile(self.hedge_percentile)
+        futures: List[Future] = [self._executor.submit(self._call, primary, image)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:  # the first endpoint is slower than usual, ask another one too
+            try:
+                secondary = self._acquire(exclude=primary)
+                secondary.hedges += 1
+                futures.append(self._executor.submit(self._call, secondary, image))
+            except requests.ConnectionError:
+                pass  # nobody else to ask
+        error: Optional[BaseException] = None
+        while futures:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            futures = list(pending)
+        assert error is not None
+        raise error
+
+    def _acquire(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e is not exclude and e.is_healthy(now)]
+            if len(candidates) == 0:
+                raise requests.ConnectionError("No healthy CompreFace servers")
+            # least outstanding requests, then the lowest median latency
+            return min(candidates, key=lambda e: (e.outstanding, e.latency_percentile(50) or 0.0))
+
+    def _call(self, endpoint: Endpoint, image: bytes) -> Dict[str, Any]:
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        s_time = time.monotonic()
+        try:
+            data = endpoint.client.recognize(image)
+        except RequestException:
+            with self._lock:
+                endpoint.outstanding -= 1
+                endpoint.errors += 1
+                self._record_failure(endpoint)
+            raise
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.consecutive_failures = 0
+            endpoint.latencies.append(time.monotonic() - s_time)
+        return data
+
+    def _record_failure(self, endpoint: Endpoint) -> None:
+        # must be called with the lock held
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= ENDPOINT_MAX_FAILURES and endpoint.is_healthy(time.monotonic()):
+            print(f"{endpoint.name} failed {endpoint.consecutive_failures} times, retrying in {ENDPOINT_COOLDOWN}s")
+            endpoint.ejected_until = time.monotonic() + ENDPOINT_COOLDOWN
+
+    def check_health(self) -> None:
+        """Pings every endpoint that isn't cooling down, servers that are out get retried by requests after that."""
+        for endpoint in self.endpoints:
+            if not endpoint.is_healthy(time.monotonic()):
+                continue
+            healthy = self.probe(endpoint)
+            with self._lock:
+                if healthy:
+                    endpoint.consecutive_failures = 0
+                else:
+                    self._record_failure(endpoint)
+
+    def probe(self, endpoint: Endpoint) -> bool:
+        """True if the server answers with a 2xx, a 401 (wrong api key) or 404 means it can't be used either."""
+        try:
+            response = requests.get(
+                f"{endpoint.name}{HEALTH_CHECK_API}",
+                headers={"x-api-key": endpoint.client.api_key},
+                timeout=RECOGNITION_TIMEOUT,
+            )
+        except RequestException:
+            return False
+        return 200 <= response.status_code < 300
+
+    def first_reachable(self) -> Optional[Endpoint]:
+        """Probes the servers in order and returns the first one that answers, None if none do."""
+        for endpoint in self.endpoints:
+            if self.probe(endpoint):
+                return endpoint
+        return None
+
+    def _health_check(self) -> None:
+        while not self._stop.wait(ENDPOINT_HEALTH_INTERVAL):
+            self.check_health()
+
+    def healthy_endpoints(self) -> List[Endpoint]:
+        now = time.monotonic()
+        return [endpoint for endpoint in self.endpoints if endpoint.is_healthy(now)]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+    def summary(self) -> str:
+        lines = []
+        for stats in self.stats():
+            p50 = f"{stats['p50'] * 1000:.0f}" if stats["p50"] is not None else "-"
+            p95 = f"{stats['p95'] * 1000:.0f}" if stats["p95"] is not None else "-"
+            ejected = " (out of rotation)" if stats["ejected"] else ""
+            lines.append(
+                f"{stats['endpoint']}: {stats['requests']} requests, {stats['errors']} errors, "
+                f"{stats['hedges']} hedged, p50 {p50} ms, p95 {p95} ms{ejected}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,151 @@
+# every recognition result in an append-only binary file per day, so attendance can be re-scored later with other
+# thresholds without keeping any video
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from easyID.classes.recognition_result import RecognitionResult
+from easyID.settings import EVENT_LOG_DIRECTORY
+
+EVENT_TOP_K = 5  # candidates kept per face, part of the file format
+EVENT_DTYPE = np.dtype(
+    [
+        ("time", "<f8"),  # unix time, every face of a frame has the same time
+        ("box", "<i2", (4,)),  # x_min, y_min, x_max, y_max
+        ("subjects", "<i4", (EVENT_TOP_K,)),  # index into the subjects file, best first, -1 for none
+        ("similarities", "<f4", (EVENT_TOP_K,)),  # nan for none
+    ]
+)
+SUBJECTS_FILE = "subjects.txt"  # one subject per line, the line number is the subject index
+
+
+def event_file(directory: Path, day: date) -> Path:
+    return directory / f"events_{day.strftime('%Y%m%d')}.bin"
+
+
+class EventLogWriter:
+    """
+    Appends events to the file of their day. Subjects are numbered in the order they're first seen, and new subjects
+    are added to the subjects file before any event that uses them, so a reader never finds an index it can't look up.
+    A record cut short by a crash is cut off before the file is appended to again.
+    """
+
+    def __init__(self, directory: Path = EVENT_LOG_DIRECTORY) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory: Path = directory
+        self.subjects: List[str] = load_subjects(directory)
+        self._subject_index: Dict[str, int] = {subject: i for i, subject in enumerate(self.subjects)}
+        self.written: int = 0
+        self._checked_files: Set[Path] = set()
+
+    def write(self, results: List[Tuple[datetime, List[RecognitionResult]]]) -> None:
+        new_subjects: List[str] = []
+        days: Dict[date, List[Tuple[float, RecognitionResult]]] = {}
+        for timestamp, frame_results in results:
+            unix_time = timestamp.timestamp()
+            for result in frame_results:
+                for subject, _ in result.subjects[:EVENT_TOP_K]:
+                    if subject not in self._subject_index:
+                        self._subject_index[subject] = len(self.subjects)
+                        self.subjects.append(subject)
+                        new_subjects.append(subject)
+                days.setdefault(timestamp.date(), []).append((unix_time, result))
+        if new_subjects:
+            with open(self.directory / SUBJECTS_FILE, "a", encoding="utf-8") as subjects_file:
+                subjects_file.writelines(f"{subject}\n" for subject in new_subjects)
+        for day, events in days.items():
+            path = event_file(self.directory, day)
+            if path not in self._checked_files:
+                self._checked_files.add(path)
+                truncate_partial_record(path)
+            with open(path, "ab") as events_file:
+                events_file.write(self._to_array(events).tobytes())
+            self.written += len(events)
+
+    def _to_array(self, events: List[Tuple[float, RecognitionResult]]) -> np.ndarray:
+        array = np.zeros(len(events), dtype=EVENT_DTYPE)
+        array["subjects"] = -1
+        array["similarities"] = np.nan
+        for i, (unix_time, result) in enumerate(events):
+            array["time"][i] = unix_time
+            array["box"][i] = (result.x_min, result.y_min, result.x_max, result.y_max)
+            for k, (subject, similarity) in enumerate(result.subjects[:EVENT_TOP_K]):
+                array["subjects"][i, k] = self._subject_index[subject]
+                array["similarities"][i, k] = similarity
+        return array
+
+
+def truncate_partial_record(path: Path) -> None:
+    if not path.exists():
+        return
+    size = path.stat().st_size
+    if size % EVENT_DTYPE.itemsize:
+        print(f"Cutting off the partial record at the end of {path}")
+        with open(path, "r+b") as events_file:
+            events_file.truncate(size - size % EVENT_DTYPE.itemsize)
+
+
+def load_subjects(directory: Path = EVENT_LOG_DIRECTORY) -> List[str]:
+    if not (directory / SUBJECTS_FILE).exists():
+        return []
+    with open(directory / SUBJECTS_FILE, encoding="utf-8") as subjects_file:
+        return subjects_file.read().splitlines()
+
+
+def load_events(day: date, directory: Path = EVENT_LOG_DIRECTORY) -> np.ndarray:
+    """The events of a day, memory mapped (read only), so only the columns that are used get read from disk."""
+    path = event_file(directory, day)
+    count = path.stat().st_size // EVENT_DTYPE.itemsize if path.exists() else 0
+    if count == 0:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode="r", shape=(count,))
+
+
+def logged_days(directory: Path = EVENT_LOG_DIRECTORY) -> List[date]:
+    return sorted(datetime.strptime(path.stem, "events_%Y%m%d").date() for path in directory.glob("events_*.bin"))
+
+
+def matches(events: np.ndarray, threshold: float, top_k: int = 1) -> np.ndarray:
+    """
+    (N, top_k) mask of the candidates that count as a match. With top_k 1 that's the best candidate above the
+    threshold, like RecognitionResult.is_matching. Larger top_k also count the runners-up above the threshold.
+    """
+    similarities = events["similarities"][:, :top_k]
+    with np.errstate(invalid="ignore"):  # nan for missing candidates compares False
+        return (similarities > threshold) & (events["subjects"][:, :top_k] >= 0)
+
+
+def best_similarities(events: np.ndarray, subject_count: int, top_k: int = 1) -> np.ndarray:
+    """
+    The highest similarity of every subject among the first top_k candidates of events, -inf for subjects that never
+    came up. A subject is present at a threshold if their best similarity is above it, so a threshold sweep only needs
+    this once per top_k.
+    """
+    subjects = events["subjects"][:, :top_k].ravel()
+    similarities = events["similarities"][:, :top_k].ravel()
+    valid = subjects >= 0
+    best = np.full(subject_count, -np.inf, dtype=np.float32)
+    np.maximum.at(best, subjects[valid], similarities[valid])
+    return best
+
+
+def attendance(events: np.ndarray, threshold: float, top_k: int = 1) -> np.ndarray:
+    """
+    Every subject matched in events with their first and last unix time and number of matches, sorted by subject.
+    Returns a structured array with subject, first, last and count fields.
+    """
+    mask = matches(events, threshold, top_k)
+    subjects = events["subjects"][:, :top_k][mask]
+    times = np.broadcast_to(events["time"][:, None], mask.shape)[mask]
+    order = np.lexsort((times, subjects))
+    subjects, times = subjects[order], times[order]
+    starts = np.flatnonzero(np.r_[True, subjects[1:] != subjects[:-1]]) if len(subjects) else np.empty(0, dtype=int)
+    ends = np.r_[starts[1:], len(subjects)]
+    summary = np.empty(len(starts), dtype=[("subject", "<i4"), ("first", "<f8"), ("last", "<f8"), ("count", "<i8")])
+    summary["subject"] = subjects[starts]
+    summary["first"] = times[starts]
+    summary["last"] = times[ends - 1]
+    summary["count"] = ends - starts
+    return summary
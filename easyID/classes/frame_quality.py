@@ -0,0 +1,113 @@
+# this scores how likely a frame is to give a confident match, so we only send the best frames to the server
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from easyID.classes.recognition_result import RecognitionResult
+from easyID.settings import FRAME_QUALITY_WINDOW
+
+QUALITY_WIDTH = 320  # frames are scored at this width
+SHARPNESS_MIDPOINT = 100.0  # laplacian variance (at QUALITY_WIDTH) that scores 0.5 for sharpness
+FACE_HEIGHT_TARGET = 0.25  # faces at least this fraction of the frame height get the full size score
+CLIPPED_LOW, CLIPPED_HIGH = 10, 245  # pixels darker / brighter than this are under / over exposed
+
+
+def frame_quality(frame: np.ndarray, faces: Optional[List[RecognitionResult]] = None) -> float:
+    """
+    Scores a frame from 0 to 1, the product of sharpness (variance of the laplacian), exposure (how far the brightness
+    is from mid gray and how much of it is clipped) and face size. With faces (usually the boxes of the last results,
+    people don't move far between frames) every face is scored on its own and the frame gets their average,
+    otherwise the whole frame is scored.
+    """
+    scale = QUALITY_WIDTH / frame.shape[1]
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+    height, width = gray.shape
+    regions: List[Tuple[slice, slice, float]] = []  # (rows, columns, size score)
+    for face in faces or []:
+        if face is None:
+            continue
+        top, bottom = max(int(face.y_min * scale), 0), min(int(face.y_max * scale), height)
+        left, right = max(int(face.x_min * scale), 0), min(int(face.x_max * scale), width)
+        if bottom - top > 2 and right - left > 2:
+            size = min(1.0, (bottom - top) / height / FACE_HEIGHT_TARGET)
+            regions.append((slice(top, bottom), slice(left, right), size))
+    if len(regions) == 0:
+        regions.append((slice(None), slice(None), 1.0))
+    scores = [region_quality(gray[rows, columns], laplacian[rows, columns]) * size for rows, columns, size in regions]
+    return float(np.mean(scores))
+
+
+def region_quality(gray: np.ndarray, laplacian: np.ndarray) -> float:
+    sharpness = float(laplacian.var())
+    sharpness_score = sharpness / (sharpness + SHARPNESS_MIDPOINT)
+    clipped = np.count_nonzero((gray < CLIPPED_LOW) | (gray > CLIPPED_HIGH)) / gray.size
+    exposure_score = (1 - abs(float(gray.mean()) - 128) / 128) * (1 - clipped)
+    return sharpness_score * exposure_score
+
+
+class FrameSelector:
+    """
+    Keeps the best frame of the last window seconds. A new frame pushes out every older frame that scored lower,
+    so the oldest frame kept is always the best one (a sliding window maximum).
+    Frames are copied, the webcam thread reuses its queued frames long before a window is over. The copies go into
+    window * fps + 1 preallocated buffers that are reused once their frame left the window, more are added if frames
+    come in faster than fps. The frame returned by take() is only valid until the next offer().
+    """
+
+    def __init__(self, window: float = FRAME_QUALITY_WINDOW, fps: float = 30.0) -> None:
+        self.window: float = window
+        self.offered: int = 0
+        self.taken: int = 0
+        # (time, score, buffer index, tracing frame id), scores decreasing
+        self._frames: Deque[Tuple[float, float, int, int]] = deque()
+        self._window_start: Optional[float] = None  # when the first frame since the last take came in
+        self._buffer_count: int = int(window * fps) + 1
+        self._buffers: List[np.ndarray] = []
+        self._free_buffers: List[int] = []
+
+    def offer(self, frame: np.ndarray, score: float, now: Optional[float] = None, frame_id: int = 0) -> None:
+        now = time.monotonic() if now is None else now
+        self.offered += 1
+        while self._frames and self._frames[-1][1] <= score:
+            self._free_buffers.append(self._frames.pop()[2])
+        self._frames.append((now, score, self._copy(frame), frame_id))
+        while self._frames[0][0] < now - self.window:
+            self._free_buffers.append(self._frames.popleft()[2])
+        if self._window_start is None:
+            self._window_start = now
+
+    def _copy(self, frame: np.ndarray) -> int:
+        if not self._buffers or self._buffers[0].shape != frame.shape:  # first frame, or the resolution changed
+            self._frames.clear()
+            self._buffers = [np.empty_like(frame) for _ in range(self._buffer_count)]
+            self._free_buffers = list(range(self._buffer_count))
+        if not self._free_buffers:  # more frames in a window than we planned for
+            self._buffers.append(np.empty_like(frame))
+            self._free_buffers.append(len(self._buffers) - 1)
+        index = self._free_buffers.pop()
+        np.copyto(self._buffers[index], frame)
+        return index
+
+    def ready(self, now: Optional[float] = None) -> bool:
+        """True once frames were collected for a whole window since the last take."""
+        now = time.monotonic() if now is None else now
+        return self._window_start is not None and now - self._window_start >= self.window
+
+    def take(self) -> Optional[Tuple[np.ndarray, float, int]]:
+        """Returns the best frame, its score and frame id, and starts a new window."""
+        if not self._frames:
+            return None
+        _, score, index, frame_id = self._frames[0]
+        self._free_buffers.extend(entry[2] for entry in self._frames)
+        self._frames.clear()
+        self._window_start = None
+        self.taken += 1
+        return self._buffers[index], score, frame_id
+
+    def stats_message(self) -> str:
+        return f"Frame selector: {self.taken} of {self.offered} frames sent"
@@ -0,0 +1,309 @@
+# where the frames come from: a usb webcam, a network camera, a video file or a directory of images
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from easyID.settings import WEBCAM_FOURCC, WEBCAM_FPS, WEBCAM_HEIGHT, WEBCAM_ID, WEBCAM_WIDTH
+
+EWMA_WEIGHT = 0.05  # weight of the newest frame in the fps / cpu averages
+MAX_STALE_GRABS = 5  # most buffered frames skipped per read
+RECONNECT_MIN, RECONNECT_MAX = 1.0, 30.0  # seconds between reconnect attempts of network cameras
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class FrameSource(ABC):
+    """
+    Something that delivers BGR frames. read() returns None when a frame couldn't be read, is_opened is False once
+    no more frames will come. Every source keeps track of its frame rate and the cpu time spent reading / decoding.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.width: int = 0
+        self.height: int = 0
+        self.fps: float = 0.0  # frames per second the source says it delivers, 0 if unknown
+        self.frames: int = 0
+        self.failed_reads: int = 0
+        self.dropped: int = 0  # stale frames skipped
+        self._frame_interval: Optional[float] = None  # running average in seconds
+        self._cpu_time: Optional[float] = None  # running average in seconds per frame
+        self._last_frame: Optional[float] = None
+
+    @property
+    @abstractmethod
+    def is_opened(self) -> bool: ...
+
+    def release(self) -> None:
+        pass
+
+    @abstractmethod
+    def _read(self) -> Optional[np.ndarray]: ...
+
+    def read(self) -> Optional[np.ndarray]:
+        cpu_start = time.thread_time()
+        frame = self._read()
+        cpu_time = time.thread_time() - cpu_start
+        if frame is None:
+            self.failed_reads += 1
+            return None
+        now = time.monotonic()
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            self._frame_interval = ewma(self._frame_interval, interval)
+        self._last_frame = now
+        self._cpu_time = ewma(self._cpu_time, cpu_time)
+        self.frames += 1
+        return frame
+
+    @property
+    def capture_fps(self) -> float:
+        return 1 / self._frame_interval if self._frame_interval else 0.0
+
+    def stats_message(self) -> str:
+        cpu = f"{self._cpu_time * 1000:.1f} ms" if self._cpu_time is not None else "-"
+        return (
+            f"{self.name}: {self.width}x{self.height} at {self.capture_fps:.1f} fps, {cpu} cpu per frame, "
+            f"{self.frames} frames, {self.dropped} stale frames skipped, {self.failed_reads} failed reads"
+        )
+
+
+class CaptureSource(FrameSource):
+    """
+    Frames from cv2.VideoCapture. Frames that were already waiting in the capture buffer are grabbed (not decoded)
+    and skipped, so read() always decodes the newest frame instead of one from a while ago.
+    """
+
+    def __init__(self, name: str, cap: cv2.VideoCapture) -> None:
+        super().__init__(name)
+        self.cap: cv2.VideoCapture = cap
+        self._update_size()
+
+    def _update_size(self) -> None:
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = float(self.cap.get(cv2.CAP_PROP_FPS))
+
+    @property
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def release(self) -> None:
+        self.cap.release()
+
+    def _read(self) -> Optional[np.ndarray]:
+        # a grab that returns right away got a frame that was already buffered, there may be a newer one behind it
+        buffered = 0.25 / self.fps if self.fps > 0 else 0.0
+        grabbed = 0
+        for _ in range(MAX_STALE_GRABS + 1):
+            s_time = time.monotonic()
+            if not self.cap.grab():
+                break
+            grabbed += 1
+            if time.monotonic() - s_time >= buffered:
+                break  # we had to wait for this frame, so it's the newest one
+        if grabbed == 0:
+            return None
+        self.dropped += grabbed - 1
+        status, frame = self.cap.retrieve()
+        return frame if status else None
+
+
+class CameraSource(CaptureSource):
+    """A local (usb) camera. MJPG lets most usb cameras deliver full resolution at full frame rate."""
+
+    def __init__(
+        self,
+        index: int = WEBCAM_ID,
+        width: Optional[int] = WEBCAM_WIDTH,
+        height: Optional[int] = WEBCAM_HEIGHT,
+        fourcc: Optional[str] = WEBCAM_FOURCC,
+        fps: Optional[float] = WEBCAM_FPS,
+    ) -> None:
+        cap = cv2.VideoCapture(index)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)
+        if fourcc is not None:  # before the resolution, some drivers only offer high resolutions in MJPG
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        # override the default resolution
+        if width is not None and height is not None:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        super().__init__(f"Camera {index}", cap)
+
+
+class NetworkSource(CaptureSource):
+    """An RTSP / MJPEG network camera, it reconnects (with backoff) when the stream drops."""
+
+    def __init__(self, url: str) -> None:
+        self.url: str = url
+        self.reconnects: int = 0
+        self._retry_delay: float = RECONNECT_MIN
+        self._retry_at: float = 0.0
+        self._released: bool = False
+        super().__init__(url, self._connect())
+
+    def _connect(self) -> cv2.VideoCapture:
+        cap = cv2.VideoCapture(self.url)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    @property
+    def is_opened(self) -> bool:
+        return not self._released  # we keep trying until we're told to stop
+
+    def release(self) -> None:
+        self._released = True
+        self.cap.release()
+
+    def _read(self) -> Optional[np.ndarray]:
+        if self.cap.isOpened():
+            frame = super()._read()
+            if frame is not None:
+                self._retry_delay = RECONNECT_MIN
+                return frame
+            print(f"Lost {self.url}, reconnecting in {self._retry_delay:.0f}s")
+            self.cap.release()
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(RECONNECT_MAX, self._retry_delay * 2)
+        elif time.monotonic() >= self._retry_at:  # not waiting in here, so we can be stopped while reconnecting
+            self.cap = self._connect()
+            self._update_size()
+            self.reconnects += 1
+            if not self.cap.isOpened():
+                self._retry_at = time.monotonic() + self._retry_delay
+                self._retry_delay = min(RECONNECT_MAX, self._retry_delay * 2)
+        return None
+
+
+class PacedSource(FrameSource):
+    """A source that can deliver frames as fast as we want, so it waits to deliver them at fps like a camera."""
+
+    def __init__(self, name: str, fps: float) -> None:
+        super().__init__(name)
+        self.fps = fps
+        self._next_frame: float = time.monotonic()
+
+    def _pace(self) -> None:
+        if self.fps <= 0:  # as fast as possible, for benchmarks
+            return
+        self._next_frame += 1 / self.fps
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:  # we're behind, don't try to catch up
+            self._next_frame = time.monotonic()
+
+
+class VideoFileSource(PacedSource):
+    """A video file, played at its own frame rate (or fps), once or over and over."""
+
+    def __init__(self, path: Path, fps: Optional[float] = None, loop: bool = False) -> None:
+        self.cap: cv2.VideoCapture = cv2.VideoCapture(str(path))
+        super().__init__(path.name, fps if fps is not None else self.cap.get(cv2.CAP_PROP_FPS))
+        self.loop: bool = loop
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    @property
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def release(self) -> None:
+        self.cap.release()
+
+    def _read(self) -> Optional[np.ndarray]:
+        self._pace()
+        status, frame = self.cap.read()
+        if not status and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            status, frame = self.cap.read()
+        if not status:
+            self.cap.release()  # the end of the video
+            return None
+        return frame
+
+
+class ImageDirectorySource(PacedSource):
+    """The images in a directory in name order, at fps, once or over and over."""
+
+    def __init__(self, directory: Path, fps: float = 10, loop: bool = False) -> None:
+        super().__init__(directory.name, fps)
+        self.paths: List[Path] = sorted(path for path in directory.iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS)
+        self.loop: bool = loop
+        self._index: int = 0
+        if self.paths:
+            first = cv2.imread(str(self.paths[0]))
+            if first is not None:
+                self.height, self.width = first.shape[:2]
+
+    @property
+    def is_opened(self) -> bool:
+        return self._index < len(self.paths)
+
+    def release(self) -> None:
+        self._index = len(self.paths)
+
+    def _read(self) -> Optional[np.ndarray]:
+        self._pace()
+        if not self.is_opened:
+            return None
+        frame = cv2.imread(str(self.paths[self._index]))
+        self._index += 1
+        if self.loop and self._index == len(self.paths):
+            self._index = 0
+        return frame
+
+
+class SyntheticSource(PacedSource):
+    """A bright blob moving over noise, for soak tests and benchmarks without a camera."""
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 15) -> None:
+        super().__init__("Synthetic", fps)
+        self.width, self.height = width, height
+        self._background: np.ndarray = np.random.randint(0, 64, (height, width, 3), dtype=np.uint8)
+        self._released: bool = False
+
+    @property
+    def is_opened(self) -> bool:
+        return not self._released
+
+    def release(self) -> None:
+        self._released = True
+
+    def _read(self) -> Optional[np.ndarray]:
+        self._pace()
+        frame = self._background.copy()
+        x = int((self.frames * 4) % self.width)
+        cv2.circle(frame, (x, self.height // 2), self.height // 5, (200, 180, 160), -1)
+        return frame
+
+
+def open_source(spec: Optional[str]) -> FrameSource:
+    """
+    Opens a source from the command line: nothing or a number is a local camera, rtsp:// and http(s):// urls are
+    network cameras, "synthetic" is a generated test pattern, a directory is read as images and anything else is
+    played as a video file.
+    """
+    if spec is None:
+        return CameraSource()
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.startswith(("rtsp://", "http://", "https://")):
+        return NetworkSource(spec)
+    if spec == "synthetic":
+        return SyntheticSource()
+    path = Path(spec).expanduser()
+    if path.is_dir():
+        return ImageDirectorySource(path)
+    if not path.exists():
+        raise ValueError(f"Frame source not found: {spec}")
+    return VideoFileSource(path)
+
+
+def ewma(average: Optional[float], value: float) -> float:
+    return value if average is None else average + EWMA_WEIGHT * (value - average)
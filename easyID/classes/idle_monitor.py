@@ -0,0 +1,99 @@
+# this keeps track of whether anyone is around, so the threads can slow down when the hallway is empty
+import time
+from enum import Enum
+from threading import Event, Lock
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from easyID.settings import IDLE_MOTION_THRESHOLD, IDLE_TIMEOUT
+
+MOTION_SIZE = (64, 48)  # frames are compared at this size, enough to see someone walk up
+MOTION_PIXEL_DELTA = 25  # a pixel has changed if its brightness changed by more than this (0 - 255)
+
+
+class ActivityState(Enum):
+    ACTIVE = "Active"
+    IDLE = "Idle"
+
+
+class IdleMonitor:
+    """
+    Goes idle after IDLE_TIMEOUT seconds without faces, and wakes up on the first frame with motion in it.
+    The webcam thread feeds it frames, the recognition thread tells it when faces were seen.
+    Motion is only looked for while idle: more than IDLE_MOTION_THRESHOLD of the pixels of a tiny grayscale copy
+    changing since the previous frame.
+    """
+
+    def __init__(self, idle_after: float = IDLE_TIMEOUT, motion_threshold: float = IDLE_MOTION_THRESHOLD) -> None:
+        self.idle_after: float = idle_after
+        self.motion_threshold: float = motion_threshold
+        self.transitions: int = 0
+        self._state: ActivityState = ActivityState.ACTIVE
+        self._active: Event = Event()  # set while active, so paused threads wake up right away
+        self._active.set()
+        self._last_activity: float = time.monotonic()
+        self._state_since: float = self._last_activity
+        self._time_in_state: Dict[ActivityState, float] = {state: 0.0 for state in ActivityState}
+        self._prev_small: Optional[np.ndarray] = None
+        self._lock: Lock = Lock()
+
+    @property
+    def state(self) -> ActivityState:
+        return self._state
+
+    @property
+    def is_idle(self) -> bool:
+        return self._state == ActivityState.IDLE
+
+    def update_frame(self, frame: np.ndarray) -> None:
+        """Called for every webcam frame, wakes up on motion and goes idle once the timeout passed."""
+        if self.is_idle:
+            small = cv2.cvtColor(cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            prev_small, self._prev_small = self._prev_small, small
+            if prev_small is not None:
+                changed = np.count_nonzero(cv2.absdiff(small, prev_small) > MOTION_PIXEL_DELTA) / small.size
+                if changed > self.motion_threshold:
+                    self._set_state(ActivityState.ACTIVE, f"motion ({changed:.1%} of the frame changed)")
+        elif time.monotonic() - self._last_activity >= self.idle_after:
+            self._set_state(ActivityState.IDLE, f"no faces for {self.idle_after / 60:g} minutes")
+
+    def faces_seen(self) -> None:
+        self._last_activity = time.monotonic()
+        if self.is_idle:
+            self._set_state(ActivityState.ACTIVE, "faces seen")
+
+    def wait_until_active(self, timeout: float) -> bool:
+        """Blocks while idle, returns True once active again or False after timeout seconds."""
+        return self._active.wait(timeout)
+
+    def time_in_states(self) -> Dict[ActivityState, float]:
+        with self._lock:
+            times = dict(self._time_in_state)
+            times[self._state] += time.monotonic() - self._state_since
+        return times
+
+    def status_message(self) -> str:
+        times = self.time_in_states()
+        total = max(sum(times.values()), 1e-9)
+        spent = ", ".join(f"{state.value.lower()} {times[state] / total:.0%}" for state in ActivityState)
+        return f"{self._state.value} ({spent}, {self.transitions} transitions)"
+
+    def _set_state(self, state: ActivityState, reason: str) -> None:
+        with self._lock:
+            if state == self._state:
+                return
+            now = time.monotonic()
+            duration = now - self._state_since
+            self._time_in_state[self._state] += duration
+            print(f"{state.value} after {duration / 60:.1f} minutes {self._state.value.lower()}: {reason}")
+            self._state = state
+            self._state_since = now
+            self.transitions += 1
+            if state == ActivityState.ACTIVE:
+                self._last_activity = now  # stay awake for at least a full timeout
+                self._prev_small = None
+                self._active.set()
+            else:
+                self._active.clear()
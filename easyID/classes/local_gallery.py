@@ -0,0 +1,157 @@
+# this is used to recognize faces locally when the CompreFace server can't be reached
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from easyID.classes.recognition_result import RecognitionResult, process_rec_results
+from easyID.settings import (
+    DETECTION_PROBABILITY_THRESHOLD,
+    FACE_DETECTION_MODEL,
+    FACE_RECOGNITION_MODEL,
+    GALLERY_DIRECTORY,
+    LOCAL_COSINE_THRESHOLD,
+    NUMBER_OF_SUBJECTS,
+    SIMILARITY_THRESHOLD,
+)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SUBJECTS_FILE = "subjects.json"
+INT8_SCALE = 127  # normalized embeddings are in [-1, 1], so int8 galleries store round(x * 127)
+
+
+class FaceEmbedder:
+    """Finds faces and computes their embeddings with the OpenCV YuNet and SFace models."""
+
+    def __init__(self, detection_model: Path = FACE_DETECTION_MODEL, recognition_model: Path = FACE_RECOGNITION_MODEL):
+        self._detector = cv2.FaceDetectorYN.create(
+            str(detection_model), "", (320, 320), score_threshold=DETECTION_PROBABILITY_THRESHOLD
+        )
+        self._recognizer = cv2.FaceRecognizerSF.create(str(recognition_model), "")
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        """Returns an (N, 15) array of faces, [x, y, w, h, 5 landmarks, score] per row."""
+        self._detector.setInputSize((frame.shape[1], frame.shape[0]))
+        _, faces = self._detector.detect(frame)
+        return faces if faces is not None else np.empty((0, 15), dtype=np.float32)
+
+    def embed(self, frame: np.ndarray, faces: np.ndarray) -> np.ndarray:
+        """Returns an (N, D) array of L2 normalized embeddings for the given faces."""
+        if len(faces) == 0:
+            return np.empty((0, 128), dtype=np.float32)
+        features = np.vstack(
+            [self._recognizer.feature(self._recognizer.alignCrop(frame, face)).reshape(-1) for face in faces]
+        )
+        return normalize(features)
+
+
+class LocalGallery:
+    """
+    A memory mapped (N, D) matrix of subject embeddings stored as float16 or int8.
+    Matching is one matrix multiply of the query embeddings against every subject, the gallery is converted to a
+    float32 (D, N) matrix once when it's loaded so queries don't read and convert the whole file every time.
+    """
+
+    def __init__(self, directory: Path = GALLERY_DIRECTORY) -> None:
+        with open(directory / SUBJECTS_FILE) as f:
+            meta = json.load(f)
+        self.subjects: List[str] = meta["subjects"]
+        self.embeddings: np.ndarray = np.load(directory / EMBEDDINGS_FILE, mmap_mode="r")
+        if len(self.subjects) != len(self.embeddings):
+            raise ValueError(
+                f"Gallery in {directory} is corrupt, {len(self.subjects)} subjects for "
+                f"{len(self.embeddings)} embeddings"
+            )
+        divisor = INT8_SCALE if self.embeddings.dtype == np.int8 else 1.0
+        self._matrix: np.ndarray = np.ascontiguousarray(self.embeddings.T, dtype=np.float32) / divisor
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    def match(self, queries: np.ndarray, k: int = NUMBER_OF_SUBJECTS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Takes an (M, D) array of normalized query embeddings and returns the indices and cosine scores of the
+        k best subjects for each query, both (M, k) and sorted best first.
+        """
+        k = min(k, len(self.subjects))
+        scores = queries.astype(np.float32) @ self._matrix
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class LocalRecognizer:
+    def __init__(self, gallery: LocalGallery, embedder: FaceEmbedder) -> None:
+        self.gallery: LocalGallery = gallery
+        self.embedder: FaceEmbedder = embedder
+
+    def recognize(self, frame: np.ndarray) -> List[RecognitionResult]:
+        faces = self.embedder.detect(frame)
+        if len(faces) == 0:
+            return []
+        indices, scores = self.gallery.match(self.embedder.embed(frame, faces))
+        similarities = cosine_to_similarity(scores)
+        # build the same response CompreFace would, so results behave exactly the same
+        results: List[Dict[str, Any]] = []
+        for face, face_indices, face_similarities in zip(faces, indices, similarities):
+            x, y, w, h = (int(v) for v in face[:4])
+            results.append(
+                {
+                    "box": {"probability": float(face[-1]), "x_min": x, "y_min": y, "x_max": x + w, "y_max": y + h},
+                    "subjects": [
+                        {"subject": self.gallery.subjects[i], "similarity": round(float(s), 5)}
+                        for i, s in zip(face_indices, face_similarities)
+                    ],
+                }
+            )
+        return process_rec_results(results)
+
+
+def load_local_recognizer(directory: Path = GALLERY_DIRECTORY) -> Optional[LocalRecognizer]:
+    """Returns None if the gallery or the models are missing, local recognition is optional."""
+    if not (directory / EMBEDDINGS_FILE).exists():
+        print(f"No local gallery found in {directory}, local recognition disabled")
+        return None
+    if not FACE_DETECTION_MODEL.exists() or not FACE_RECOGNITION_MODEL.exists():
+        print("Face detection / recognition models not found, local recognition disabled")
+        return None
+    gallery = LocalGallery(directory)
+    print(f"Local gallery loaded with {len(gallery)} subjects")
+    return LocalRecognizer(gallery, FaceEmbedder())
+
+
+def write_gallery(
+    subjects: List[str], embeddings: np.ndarray, directory: Path = GALLERY_DIRECTORY, dtype: str = "float16"
+) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    embeddings = normalize(embeddings.astype(np.float32))
+    if dtype == "int8":
+        stored = np.round(embeddings * INT8_SCALE).astype(np.int8)
+    else:
+        stored = embeddings.astype(np.float16)
+    # write to temporary files first so a running app never maps a half written gallery
+    np.save(directory / f"{EMBEDDINGS_FILE}.tmp.npy", stored)
+    with open(directory / f"{SUBJECTS_FILE}.tmp", "w") as f:
+        json.dump({"subjects": subjects, "dtype": dtype}, f)
+    os.replace(directory / f"{EMBEDDINGS_FILE}.tmp.npy", directory / EMBEDDINGS_FILE)
+    os.replace(directory / f"{SUBJECTS_FILE}.tmp", directory / SUBJECTS_FILE)
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def cosine_to_similarity(scores: np.ndarray) -> np.ndarray:
+    # SFace cosine scores aren't on the same scale as CompreFace similarities, so we map LOCAL_COSINE_THRESHOLD onto
+    # SIMILARITY_THRESHOLD (piecewise linear) and everything else around it, that way is_matching means the same thing.
+    scores = np.clip(scores, 0.0, 1.0)
+    below = scores / LOCAL_COSINE_THRESHOLD * SIMILARITY_THRESHOLD
+    above = SIMILARITY_THRESHOLD + (scores - LOCAL_COSINE_THRESHOLD) / (1 - LOCAL_COSINE_THRESHOLD) * (
+        1 - SIMILARITY_THRESHOLD
+    )
+    return np.where(scores < LOCAL_COSINE_THRESHOLD, below, above)
@@ -0,0 +1,122 @@
+# this decides how often and at what resolution the recognition thread should send frames to the server
+import random
+import time
+from enum import Enum
+from threading import Lock
+from typing import Optional
+
+from easyID.settings import (
+    RECOGNITION_BACKOFF_BASE,
+    RECOGNITION_BACKOFF_MAX,
+    RECOGNITION_MAX_ERROR_RATE,
+    RECOGNITION_MAX_INTERVAL,
+    RECOGNITION_MIN_INTERVAL,
+    RECOGNITION_MIN_SCALE,
+    RECOGNITION_TARGET_LATENCY,
+)
+
+EWMA_WEIGHT = 0.2  # how much a new measurement counts towards the running averages
+
+
+class ControllerState(Enum):
+    NORMAL = "Normal"  # full rate and resolution
+    DEGRADED = "Degraded"  # server is slow, sending fewer / smaller frames
+    OFFLINE = "Offline"  # server is unreachable, waiting to reconnect
+
+
+class RateController:
+    """
+    Measures round trip latency and error rate of recognize requests and adjusts the submission rate and
+    recognition resolution to stay under the target latency. When requests fail it backs off exponentially (with jitter)
+    and keeps retrying instead of giving up.
+    """
+
+    def __init__(
+        self,
+        target_latency: float = RECOGNITION_TARGET_LATENCY,
+        min_interval: float = RECOGNITION_MIN_INTERVAL,
+        max_interval: float = RECOGNITION_MAX_INTERVAL,
+        min_scale: float = RECOGNITION_MIN_SCALE,
+    ) -> None:
+        self.target_latency: float = target_latency
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.min_scale: float = min_scale
+
+        self.latency: Optional[float] = None  # running average in seconds
+        self.error_rate: float = 0.0  # running average of failed requests (0 - 1)
+        self.interval: float = min_interval  # seconds between requests
+        self.scale: float = 1.0  # fraction of the webcam resolution to send
+        self.consecutive_failures: int = 0
+        self._retry_at: float = 0.0  # monotonic time of the next reconnect attempt
+        self._last_submit: float = 0.0
+        self._lock: Lock = Lock()
+
+    @property
+    def state(self) -> ControllerState:
+        if self.consecutive_failures > 0:
+            return ControllerState.OFFLINE
+        if self.scale < 1.0 or self.interval > self.min_interval:
+            return ControllerState.DEGRADED
+        return ControllerState.NORMAL
+
+    def ready(self) -> bool:
+        """Returns True if a new request can be sent now."""
+        now = time.monotonic()
+        with self._lock:
+            if self.consecutive_failures > 0:
+                return now >= self._retry_at
+            return now - self._last_submit >= self.interval
+
+    def submitted(self) -> None:
+        with self._lock:
+            self._last_submit = time.monotonic()
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.latency = latency if self.latency is None else self.latency + EWMA_WEIGHT * (latency - self.latency)
+            self.error_rate -= EWMA_WEIGHT * self.error_rate
+            self._adjust()
+
+    def record_failure(self) -> float:
+        """Records a failed request and returns the number of seconds until the next retry."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.error_rate += EWMA_WEIGHT * (1.0 - self.error_rate)
+            # exponential backoff with "equal jitter" so a room full of kiosks doesn't reconnect all at once
+            delay = min(RECOGNITION_BACKOFF_MAX, RECOGNITION_BACKOFF_BASE * 2 ** (self.consecutive_failures - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            self._retry_at = time.monotonic() + delay
+            self._adjust()
+            return delay
+
+    def _adjust(self) -> None:
+        # we slow down first and only shrink frames if that's not enough, then recover in the opposite order
+        overloaded = self.error_rate > RECOGNITION_MAX_ERROR_RATE or (
+            self.latency is not None and self.latency > self.target_latency
+        )
+        underloaded = self.error_rate < RECOGNITION_MAX_ERROR_RATE / 2 and (
+            self.latency is not None and self.latency < self.target_latency * 0.75
+        )
+        if overloaded:
+            if self.interval < self.max_interval:
+                self.interval = min(self.max_interval, max(self.interval, 0.05) * 1.5)
+            else:
+                self.scale = max(self.min_scale, self.scale - 0.1)
+        elif underloaded:
+            if self.scale < 1.0:
+                self.scale = min(1.0, self.scale + 0.05)
+            else:
+                self.interval = max(self.min_interval, self.interval * 0.9 - 0.01)
+
+    def status_message(self) -> str:
+        state = self.state
+        if state == ControllerState.OFFLINE:
+            retry_in = max(0.0, self._retry_at - time.monotonic())
+            return f"Recognition: {state.value}, retrying in {retry_in:.0f}s ({self.consecutive_failures} failures)"
+        latency = f"{self.latency * 1000:.0f} ms" if self.latency is not None else "-"
+        return (
+            f"Recognition: {state.value}, latency {latency}, errors {self.error_rate:.0%}, "
+            f"interval {self.interval:.2f}s, resolution {self.scale:.0%}"
+        )
@@ -0,0 +1,45 @@
+# this talks to the CompreFace recognize endpoint directly, the sdk doesn't let us set a timeout.
+from typing import Any, Dict
+
+import requests
+
+from easyID.settings import CF_OPTIONS, RECOGNITION_TIMEOUT
+
+RECOGNIZE_API = "/api/v1/recognition/recognize"
+
+
+class RecognitionClient:
+    def __init__(
+        self,
+        api_key: str,
+        host: str,
+        port: str,
+        options: Dict[str, Any] = CF_OPTIONS,
+        timeout: float = RECOGNITION_TIMEOUT,
+    ) -> None:
+        self.api_key: str = api_key
+        self.host: str = host
+        self.port: str = port
+        self.url: str = f"{host}:{port}{RECOGNIZE_API}"
+        # the api wants lowercase booleans in the query string
+        self.params: Dict[str, Any] = {
+            key: str(value).lower() if isinstance(value, bool) else value for key, value in options.items()
+        }
+        self.timeout: float = timeout
+        self._session: requests.Session = requests.Session()  # keep the connection alive between frames
+
+    def recognize(self, image: bytes) -> Dict[str, Any]:
+        """
+        Sends a jpg image to the server and returns the decoded json response.
+        Raises a requests.RequestException if the server can't be reached, times out or has an internal error.
+        """
+        response = self._session.post(
+            self.url,
+            params=self.params,
+            headers={"x-api-key": self.api_key},
+            files={"file": ("frame.jpg", image, "image/jpeg")},
+            timeout=self.timeout,
+        )
+        if response.status_code >= 500:  # 400 just means no face was found, so we only fail on server errors
+            response.raise_for_status()
+        return response.json()
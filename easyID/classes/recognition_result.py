@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from easyID.settings import SIMILARITY_THRESHOLD
 
@@ -15,9 +15,11 @@ class RecognitionResult:
     sex: Optional[str]
     subject: Optional[str]
     similarity: Optional[float]
+    subjects: Tuple[Tuple[str, float], ...] = ()  # (subject, similarity) of every candidate, best first
 
     @classmethod
-    def from_result(cls, result: Dict[str, Any]) -> "RecognitionResult":
+    def from_result(cls, result: Dict[str, Any], scale: float = 1.0) -> "RecognitionResult":
+        # scale is the fraction of the original frame size that was sent, boxes are mapped back to the original frame
         if result["box"]:
             age = result.get("age", {})
             age_high = age.get("high")
@@ -26,16 +28,22 @@ class RecognitionResult:
             subject_d = result.get("subjects", [{}])[0]
             subject = subject_d.get("subject")
             similarity = subject_d.get("similarity")
+            subjects = tuple(
+                (candidate["subject"], candidate["similarity"])
+                for candidate in result.get("subjects", [])
+                if candidate.get("subject") is not None and candidate.get("similarity") is not None
+            )
             return cls(
-                result["box"]["x_min"],
-                result["box"]["y_min"],
-                result["box"]["x_max"],
-                result["box"]["y_max"],
+                round(result["box"]["x_min"] / scale),
+                round(result["box"]["y_min"] / scale),
+                round(result["box"]["x_max"] / scale),
+                round(result["box"]["y_max"] / scale),
                 age_high,
                 age_low,
                 sex,
                 subject,
                 similarity,
+                subjects,
             )
 
     @property
@@ -43,7 +51,7 @@ class RecognitionResult:
         return self.subject is not None and self.similarity is not None and self.similarity > SIMILARITY_THRESHOLD
 
 
-def process_rec_results(results: Optional[list[dict[str, Any]]]) -> List[RecognitionResult]:
+def process_rec_results(results: Optional[list[dict[str, Any]]], scale: float = 1.0) -> List[RecognitionResult]:
     if results is None:
         return []
-    return [RecognitionResult.from_result(result) for result in results]
+    return [RecognitionResult.from_result(result, scale) for result in results]
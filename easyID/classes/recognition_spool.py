@@ -0,0 +1,149 @@
+# this keeps frames on disk while the server is down, so the people in them can still be recognized and logged later
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Deque, List, Tuple
+
+import cv2
+import numpy as np
+
+from easyID.classes.stranger_index import StrangerIndex, dhash
+from easyID.settings import (
+    SPOOL_DEDUPE_WINDOW,
+    SPOOL_DIRECTORY,
+    SPOOL_HASH_DISTANCE,
+    SPOOL_JPEG_QUALITY,
+    SPOOL_MAX_MB,
+    SPOOL_MIN_INTERVAL,
+    SPOOL_SCALE,
+)
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S_%f"  # file names are capture times, so they sort oldest first
+RATE_WINDOW = 60  # seconds the drain rate is averaged over
+
+
+class RecognitionSpool:
+    """
+    Down-scaled jpgs of frames captured while the server was unreachable, named after their capture time.
+    At most one frame every SPOOL_MIN_INTERVAL seconds is kept, and frames that look like one kept in the last
+    SPOOL_DEDUPE_WINDOW seconds are skipped (the same person standing in front of the kiosk).
+    The oldest frames are deleted once the spool is over SPOOL_MAX_MB. Frames left over from the last run are kept.
+    A frame that can't be written (full or missing disk) is counted and dropped, recognition carries on without it.
+    """
+
+    def __init__(self, directory: Path = SPOOL_DIRECTORY, max_bytes: int = SPOOL_MAX_MB * 2**20) -> None:
+        self.directory: Path = directory
+        self.max_bytes: int = max_bytes
+        self.spooled: int = 0
+        self.skipped: int = 0
+        self.evicted: int = 0
+        self.drained: int = 0
+        self.failed: int = 0  # frames that couldn't be written
+        self._files: Deque[Tuple[Path, int]] = deque()  # (path, size), oldest first
+        self._bytes: int = 0
+        self._last_spooled: float = 0.0
+        self._recent: StrangerIndex = StrangerIndex(SPOOL_DEDUPE_WINDOW, SPOOL_HASH_DISTANCE)
+        self._drain_times: Deque[float] = deque()
+        self._lock: Lock = Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.directory.glob("*.jpg")):
+            try:
+                datetime.strptime(path.stem, TIMESTAMP_FORMAT)
+            except ValueError:  # not one of ours
+                continue
+            size = path.stat().st_size
+            self._files.append((path, size))
+            self._bytes += size
+        if self._files:
+            print(f"{len(self._files)} spooled frames left over, they'll be recognized once the server is reachable")
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def add(self, frame: np.ndarray, timestamp: datetime) -> bool:
+        """
+        Spools a frame captured at timestamp, returns False if it was too soon after or too similar to the last, or
+        couldn't be written.
+        """
+        now = time.monotonic()
+        if now - self._last_spooled < SPOOL_MIN_INTERVAL:
+            self.skipped += 1
+            return False
+        small = cv2.resize(frame, None, fx=SPOOL_SCALE, fy=SPOOL_SCALE, interpolation=cv2.INTER_AREA)
+        frame_hash = dhash(small)
+        if self._recent.is_known(frame_hash):
+            self.skipped += 1
+            return False
+        _, im_buf_arr = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, SPOOL_JPEG_QUALITY])
+        path = self.directory / f"{timestamp.strftime(TIMESTAMP_FORMAT)}.jpg"
+        temp_path = path.with_suffix(".tmp")  # so the drainer never reads half a file
+        try:
+            temp_path.write_bytes(im_buf_arr.tobytes())
+            temp_path.replace(path)
+        except OSError as e:
+            self.failed += 1
+            print("Error spooling frame: ", e)
+            remove_file(temp_path)
+            return False
+        self._recent.add(frame_hash)
+        with self._lock:
+            self._files.append((path, im_buf_arr.size))
+            self._bytes += im_buf_arr.size
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                old_path, old_size = self._files.popleft()
+                remove_file(old_path)
+                self._bytes -= old_size
+                self.evicted += 1
+        self._last_spooled = now
+        self.spooled += 1
+        return True
+
+    def peek(self, count: int) -> List[Tuple[Path, datetime]]:
+        """The oldest count frames and their capture times, they stay spooled until they're removed."""
+        with self._lock:
+            oldest = [path for path, _ in list(self._files)[:count]]
+        return [(path, datetime.strptime(path.stem, TIMESTAMP_FORMAT)) for path in oldest]
+
+    def remove(self, path: Path) -> None:
+        """Removes a frame once it's been recognized."""
+        with self._lock:
+            for i, (spooled_path, size) in enumerate(self._files):
+                if spooled_path == path:
+                    del self._files[i]
+                    self._bytes -= size
+                    break
+            else:  # evicted in the meantime
+                return
+            now = time.monotonic()
+            self._drain_times.append(now)
+            while self._drain_times[0] < now - RATE_WINDOW:
+                self._drain_times.popleft()
+        remove_file(path)
+        self.drained += 1
+
+    def drain_rate(self) -> float:
+        """Frames per second drained over the last minute."""
+        with self._lock:
+            recent = sum(1 for drained_at in self._drain_times if drained_at >= time.monotonic() - RATE_WINDOW)
+        return recent / RATE_WINDOW
+
+    def stats_message(self) -> str:
+        return (
+            f"Spool: {len(self)} frames ({self._bytes / 2**20:.1f} MB) waiting, {self.spooled} spooled, "
+            f"{self.skipped} skipped, {self.evicted} evicted, {self.failed} failed, {self.drained} drained "
+            f"({self.drain_rate():.1f}/s)"
+        )
+
+
+def remove_file(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Error deleting {path}: ", e)
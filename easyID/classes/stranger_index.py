@@ -0,0 +1,72 @@
+# this remembers the faces of recent unidentified people, so we only alert once per stranger
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from easyID.classes.recognition_result import RecognitionResult
+from easyID.settings import UNIDENTIFIED_DEDUPE_WINDOW, UNIDENTIFIED_HASH_DISTANCE
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image, a 64 bit perceptual hash that barely changes between frames of the same face.
+    Each bit says whether a pixel of the shrunken grayscale image is brighter than its right neighbour.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def stranger_hashes(frame: np.ndarray, results: List[RecognitionResult]) -> List[int]:
+    """Hashes of the unknown faces in results, frame has to be the one they came from with nothing drawn on it."""
+    hashes = []
+    for result in results:
+        if result.subject and result.is_matching:
+            continue
+        top, left = max(result.y_min, 0), max(result.x_min, 0)
+        bottom, right = result.y_max, result.x_max
+        face = frame[top:bottom, left:right]
+        if face.size > 0:
+            hashes.append(dhash(face))
+    return hashes
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class StrangerIndex:
+    """
+    Hashes of unknown faces we already alerted on and when they were last seen.
+    A face within UNIDENTIFIED_HASH_DISTANCE bits of a stored hash is the same stranger, they stay suppressed until
+    they haven't been seen for UNIDENTIFIED_DEDUPE_WINDOW seconds. Used from both the video and gui threads.
+    """
+
+    def __init__(self, window: float = UNIDENTIFIED_DEDUPE_WINDOW, max_distance: int = UNIDENTIFIED_HASH_DISTANCE):
+        self.window: float = window
+        self.max_distance: int = max_distance
+        self._last_seen: Dict[int, float] = {}  # {hash: time last seen}
+        self._lock: Lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+    def is_known(self, face_hash: int, now: Optional[float] = None) -> bool:
+        """Returns True if we already alerted on this stranger, and keeps them suppressed for another window."""
+        now = time.time() if now is None else now
+        with self._lock:
+            # forget strangers that left
+            self._last_seen = {h: seen for h, seen in self._last_seen.items() if now - seen <= self.window}
+            for known_hash in self._last_seen:
+                if hamming_distance(face_hash, known_hash) <= self.max_distance:
+                    self._last_seen[known_hash] = now
+                    return True
+        return False
+
+    def add(self, face_hash: int, now: Optional[float] = None) -> None:
+        with self._lock:
+            self._last_seen[face_hash] = time.time() if now is None else now
@@ -1,7 +1,13 @@
 # this is used by the import scripts & used by the app to re standardize the data
+import re
 from dataclasses import dataclass
 from pathlib import Path
 
+# "Last, First (ID) [Grade]", names can have spaces in them, teachers have a T instead of a grade
+SUBJECT_STRING_PATTERN = re.compile(
+    r"^(?P<last_name>.+?), (?P<first_name>.+) \((?P<id_number>\d+)\) \[(?P<grade>\d+|T)\]$"
+)
+
 
 @dataclass(frozen=True)
 class SubjectRecord:
@@ -21,17 +27,11 @@ class SubjectRecord:
         """
         This is used by the app to reparse the subject data
         """
-        # split the string back into its parts
-        last_name, first_name, id_number, grade = subject_string.split(" ")
-        # remove the brackets
-        grade = grade[1:-1] if grade[1] != "T" else 13
-        # remove the parentheses
-        id_number = id_number[1:-1]
-        # remove the comma
-        last_name = last_name[:-1]
-        if not id_number.isdigit():
-            raise ValueError("Invalid ID number")
-        return cls(last_name, first_name, id_number, int(grade))
+        match = SUBJECT_STRING_PATTERN.match(subject_string)
+        if match is None:
+            raise ValueError(f"Invalid subject: {subject_string}")
+        grade = match["grade"]
+        return cls(match["last_name"], match["first_name"], match["id_number"], 13 if grade == "T" else int(grade))
 
     @property
     def is_teacher(self) -> bool:
@@ -0,0 +1,132 @@
+# this keeps every known subject in memory, so the app can look them up instead of re-parsing subject strings
+import os
+import time
+from pathlib import Path
+from threading import Event, Thread
+from typing import Dict, FrozenSet, List, Optional
+
+import requests
+from requests import RequestException
+
+from easyID.classes.endpoint_pool import EndpointPool
+from easyID.classes.subject_record import SubjectRecord
+from easyID.settings import RECOGNITION_TIMEOUT, SUBJECT_CACHE_FILE, SUBJECT_REFRESH_INTERVAL
+
+SUBJECTS_API = "/api/v1/recognition/subjects"
+
+
+class SubjectRegistry:
+    """
+    Every subject on the CompreFace server, indexed by subject string, ID number and grade.
+    It starts from a local cache file (one subject string per line) and is refreshed from the server in the
+    background, only new subjects are parsed. The indexes are replaced as a whole, so readers never need a lock.
+    """
+
+    def __init__(self, endpoint_pool: Optional[EndpointPool], cache_file: Path = SUBJECT_CACHE_FILE) -> None:
+        self._endpoint_pool: Optional[EndpointPool] = endpoint_pool
+        self._cache_file: Path = cache_file
+        self._stop: Event = Event()
+        self._refresh_thread: Thread = Thread(target=self._refresh_loop, name="SubjectRegistryThread", daemon=True)
+
+        self._by_string: Dict[str, SubjectRecord] = {}
+        self._by_id: Dict[str, SubjectRecord] = {}
+        self._by_grade: Dict[int, FrozenSet[SubjectRecord]] = {}
+        self.load_cache()
+
+    def __len__(self) -> int:
+        return len(self._by_string)
+
+    def __contains__(self, subject_string: str) -> bool:
+        return subject_string in self._by_string
+
+    def start(self) -> None:
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def resolve(self, subject_string: str) -> Optional[SubjectRecord]:
+        """Returns the record for a subject string from CompreFace, None if it isn't a valid subject."""
+        record = self._by_string.get(subject_string)
+        if record is None:  # added to the server since our last refresh
+            try:
+                record = SubjectRecord.from_string(subject_string)
+            except ValueError:
+                return None
+            self._update({**self._by_string, subject_string: record})
+        return record
+
+    def by_id(self, id_number: str) -> Optional[SubjectRecord]:
+        return self._by_id.get(id_number)
+
+    def by_grade(self, grade: int) -> FrozenSet[SubjectRecord]:
+        return self._by_grade.get(grade, frozenset())
+
+    def load_cache(self) -> None:
+        if not self._cache_file.exists():
+            return
+        with open(self._cache_file) as f:
+            self._apply_subject_list([line.rstrip("\n") for line in f if line.strip()])
+        print(f"{len(self)} Subjects loaded from {self._cache_file}")
+
+    def save_cache(self) -> None:
+        self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self._cache_file.with_suffix(".tmp")
+        with open(temp_file, "w") as f:
+            f.writelines(f"{subject_string}\n" for subject_string in sorted(self._by_string.keys()))
+        os.replace(temp_file, self._cache_file)
+
+    def refresh(self) -> bool:
+        """Gets the subject list from the server, returns True if anything changed."""
+        if self._endpoint_pool is None or len(self._endpoint_pool.healthy_endpoints()) == 0:
+            return False
+        endpoint = self._endpoint_pool.healthy_endpoints()[0]
+        try:
+            response = requests.get(
+                f"{endpoint.name}{SUBJECTS_API}",
+                headers={"x-api-key": endpoint.client.api_key},
+                timeout=RECOGNITION_TIMEOUT,
+            )
+            response.raise_for_status()
+            subject_strings: List[str] = response.json().get("subjects", [])
+        except (RequestException, ValueError) as e:
+            print("Error refreshing subjects: ", e)
+            return False
+        changed = self._apply_subject_list(subject_strings)
+        if changed:
+            self.save_cache()
+        return changed
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            s_time = time.monotonic()
+            if self.refresh():
+                print(f"Subjects refreshed, {len(self)} Subjects in {time.monotonic() - s_time:.2f} Seconds")
+            self._stop.wait(SUBJECT_REFRESH_INTERVAL)
+
+    def _apply_subject_list(self, subject_strings: List[str]) -> bool:
+        # incremental, existing records are kept and only new subject strings are parsed
+        by_string: Dict[str, SubjectRecord] = {}
+        for subject_string in subject_strings:
+            record = self._by_string.get(subject_string)
+            if record is None:
+                try:
+                    record = SubjectRecord.from_string(subject_string)
+                except ValueError:
+                    print(f"Skipping invalid subject: {subject_string}")
+                    continue
+            by_string[subject_string] = record
+        if by_string.keys() == self._by_string.keys():
+            return False
+        self._update(by_string)
+        return True
+
+    def _update(self, by_string: Dict[str, SubjectRecord]) -> None:
+        by_id: Dict[str, SubjectRecord] = {}
+        by_grade: Dict[int, set[SubjectRecord]] = {}
+        for record in by_string.values():
+            by_id[record.id_number] = record
+            by_grade.setdefault(record.grade, set()).add(record)
+        self._by_string = by_string
+        self._by_id = by_id
+        self._by_grade = {grade: frozenset(records) for grade, records in by_grade.items()}
@@ -0,0 +1,153 @@
+# per-frame timing spans, kept in a ring buffer and saved as a chrome trace (chrome://tracing, ui.perfetto.dev)
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from easyID.settings import TRACE_BUFFER_SIZE, TRACE_DIRECTORY, TRACING
+
+
+class Tracer:
+    """
+    Records spans (name, frame id, thread, start, end) from every thread, times are time.perf_counter() seconds.
+    Only the last TRACE_BUFFER_SIZE spans are kept. Frame ids are handed out by the webcam thread and passed along with
+    the frame and its results, spans with the same frame id are joined by flow arrows in the trace so one frame can be
+    followed from capture to the screen and the log. Frame id 0 means the span isn't about one frame.
+    """
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE, enabled: bool = TRACING) -> None:
+        self.enabled: bool = enabled
+        self._spans: Deque[Tuple[str, int, int, float, float]] = deque(maxlen=size)
+        self._thread_names: Dict[int, str] = {}
+        self._frame_ids = itertools.count(1)
+        self._lock: Lock = Lock()
+
+    def next_frame_id(self) -> int:
+        return next(self._frame_ids)
+
+    def record(self, name: str, frame_id: int, start: float, end: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        thread_id = threading.get_ident()
+        if thread_id not in self._thread_names:
+            self._thread_names[thread_id] = threading.current_thread().name
+        with self._lock:
+            self._spans.append((name, frame_id, thread_id, start, end))
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The spans as chrome trace events: complete events, flow events between them and thread names."""
+        with self._lock:
+            spans = list(self._spans)
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}}
+            for thread_id, thread_name in list(self._thread_names.items())
+        ]
+        frames: Dict[int, List[Tuple[float, int]]] = {}  # {frame id: [(start, thread)]}
+        for name, frame_id, thread_id, start, end in spans:
+            event: Dict[str, Any] = {
+                "name": name,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": thread_id,
+            }
+            if frame_id:
+                event["args"] = {"frame": frame_id}
+                frames.setdefault(frame_id, []).append((start, thread_id))
+            events.append(event)
+        for frame_id, steps in frames.items():
+            if len(steps) < 2:
+                continue
+            steps.sort()
+            for i, (start, thread_id) in enumerate(steps):
+                phase = "s" if i == 0 else "f" if i == len(steps) - 1 else "t"
+                # flow events attach to the span on their thread that encloses their timestamp
+                events.append(
+                    {
+                        "name": "frame",
+                        "cat": "frame",
+                        "ph": phase,
+                        "id": frame_id,
+                        "ts": start * 1e6,
+                        "pid": pid,
+                        "tid": thread_id,
+                        "bp": "e",
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        if path is None:
+            TRACE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+            path = TRACE_DIRECTORY / f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        trace = self.chrome_trace()
+        with open(path, "w") as trace_file:
+            json.dump(trace, trace_file)
+        print(f"Trace of {len(trace['traceEvents'])} events saved to {path}")
+        return path
+
+
+class Span:
+    """Records the time spent in a with block."""
+
+    __slots__ = ("_tracer", "_name", "_frame_id", "_start")
+
+    def __init__(self, tracer: Tracer, name: str, frame_id: int) -> None:
+        self._tracer: Tracer = tracer
+        self._name: str = name
+        self._frame_id: int = frame_id
+        self._start: float = 0.0
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._tracer.record(self._name, self._frame_id, self._start)
+
+
+class _NoSpan:
+    """What span() returns while tracing is off, so the with blocks cost next to nothing."""
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *_) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+_tracer: Tracer = Tracer()
+
+
+def span(name: str, frame_id: int = 0):
+    return Span(_tracer, name, frame_id) if _tracer.enabled else _NO_SPAN
+
+
+def record(name: str, frame_id: int, start: float, end: Optional[float] = None) -> None:
+    _tracer.record(name, frame_id, start, end)
+
+
+def next_frame_id() -> int:
+    return _tracer.next_frame_id()
+
+
+def enabled() -> bool:
+    return _tracer.enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    _tracer.enabled = enabled
+
+
+def save(path: Optional[Path] = None) -> Path:
+    return _tracer.save(path)
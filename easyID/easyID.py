@@ -1,19 +1,23 @@
 import argparse
 import os
+import signal
 import sys
 import time
 from datetime import datetime
 from pathlib import Path
+from typing import List
 
-from PySide6.QtCore import Qt, QUrl, Slot
+from PySide6.QtCore import Qt, QTimer, QUrl, Slot
 from PySide6.QtGui import QAction, QCloseEvent, QDesktopServices, QGuiApplication, QIcon, QPixmap
 from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
 from PySide6.QtWidgets import (
     QApplication,
+    QDockWidget,
     QHBoxLayout,
     QLabel,
+    QListWidget,
+    QListWidgetItem,
     QMainWindow,
-    QMessageBox,
     QPushButton,
     QTabWidget,
     QToolBar,
@@ -21,17 +25,23 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from easyID.classes import tracing
+from easyID.classes.frame_source import open_source
+from easyID.classes.subject_registry import SubjectRegistry
 from easyID.settings import (
+    ALERT_SOUND_INTERVAL,
     API_KEY,
     DEFAULT_DIRECTORY,
     DEFAULT_HOST,
     DEFAULT_PORT,
+    MAX_ALERTS,
+    MAX_UNIDENTIFIED_TABS,
     MUTE_ALERTS,
     SELF_SIGNED_CERT_DIR,
     UNIDENTIFIED_SUBJECTS_TIMEOUT,
-    WEBCAM_ID,
 )
 from easyID.threads.logging_thread import LoggingThread
+from easyID.threads.profiler_thread import ProfilerThread
 from easyID.threads.recognition_thread import RecognitionThread
 from easyID.threads.video_thread import VideoThread
 from easyID.threads.webcam_thread import WebcamThread
@@ -46,8 +56,22 @@ def parse_arguments() -> argparse.Namespace:
         type=str,
         default=API_KEY,
     )
-    parser.add_argument("--host", help="CompreFace host", type=str, default=DEFAULT_HOST)
-    parser.add_argument("--port", help="CompreFace port", type=str, default=DEFAULT_PORT)
+    parser.add_argument("--host", help="CompreFace host(s)", type=str, nargs="+", default=[DEFAULT_HOST])
+    parser.add_argument(
+        "--port", help="CompreFace port, or one port per host", type=str, nargs="+", default=[DEFAULT_PORT]
+    )
+    parser.add_argument(
+        "--source",
+        help="Camera number, rtsp:// or http:// camera url, video file, directory of images or synthetic",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--profile", help="Start the profiler right away (also toggled with SIGUSR1)", action="store_true"
+    )
+    parser.add_argument(
+        "--trace", help="Record per-frame tracing spans, saved with Tools > Save Trace or SIGUSR2", action="store_true"
+    )
 
     args = parser.parse_args()
 
@@ -96,7 +120,7 @@ class ImageView(QWidget):
     @Slot()
     def delete(self) -> None:
         os.remove(self._file_name)
-        self._parent.removeTab(self._index)
+        self._parent.removeTab(self._parent.indexOf(self))  # other tabs may have been closed since we were added
 
     @Slot()
     def copy(self) -> None:
@@ -115,24 +139,31 @@ class MainWindow(QMainWindow):
         # window objects
         self.last_unidentified_time: int = 0  # gap between last unidentified subject and current time to avoid spam
         self._video_pixmap: QPixmap = QPixmap()
+        self._frame_size: tuple[int, int] = (0, 0)  # the viewfinder is sized for this, (0, 0) until it's known
         self._tab_widget: QTabWidget = QTabWidget(self)
         self._camera_viewfinder: QLabel = QLabel(self)
+        self._recognition_status: QLabel = QLabel(self)  # permanent status bar entry
+        self._status_timer: QTimer = QTimer(self)
 
         # unidentified alerts & audio ( use default device )
         self._unidentified_person_audio: QMediaPlayer = QMediaPlayer(self)
-        self._unidentified_person_alert: QMessageBox = QMessageBox(self)
+        self._alerts_list: QListWidget = QListWidget(self)  # notification area, newest first
+        self._unidentified_tabs: list[ImageView] = []  # oldest first
+        self.last_alert_sound_time: float = 0  # alerts close together share one sound
 
         # setup unidentified person alerts
         audio_output = QAudioOutput(self)
         audio_output.setVolume(0.0 if MUTE_ALERTS else 0.25)
         self._unidentified_person_audio.setAudioOutput(audio_output)
         self._unidentified_person_audio.setSource(QUrl.fromLocalFile("unidentified.wav"))
-        self._unidentified_person_alert.setText("Unidentified Person")
-        self._unidentified_person_alert.setIcon(QMessageBox.Icon.Warning)
+        alerts_dock = QDockWidget("Alerts", self)
+        alerts_dock.setWidget(self._alerts_list)
+        self.addDockWidget(Qt.RightDockWidgetArea, alerts_dock)
+        self._alerts_list.itemActivated.connect(self.open_alert)
 
         # setup toolbar and menus
-        tool_bar = QToolBar(self)
-        self.addToolBar(tool_bar)
+        self._tool_bar: QToolBar = QToolBar(self)
+        self.addToolBar(self._tool_bar)
 
         # setup file menu and take picture action
         file_menu = self.menuBar().addMenu("&File")
@@ -146,7 +177,7 @@ class MainWindow(QMainWindow):
         )
         self._take_picture_action.setToolTip("Take Picture")
         file_menu.addAction(self._take_picture_action)
-        tool_bar.addAction(self._take_picture_action)
+        self._tool_bar.addAction(self._take_picture_action)
 
         exit_action = QAction(
             QIcon.fromTheme("application-exit"),
@@ -157,6 +188,21 @@ class MainWindow(QMainWindow):
         )
         file_menu.addAction(exit_action)
 
+        # add Tools menu, the profiler can be turned on and off while the app is running
+        self.profiler = ProfilerThread()
+        tools_menu = self.menuBar().addMenu("&Tools")
+        self._profiling_action = QAction("&Profiling", self, checkable=True, toggled=self.set_profiling)
+        self._profiling_action.setToolTip("Sample thread stacks and track memory growth")
+        tools_menu.addAction(self._profiling_action)
+        # per-frame spans go to a ring buffer while tracing is on, saving writes out what's in it
+        self._tracing_action = QAction("T&racing", self, checkable=True, toggled=self.set_tracing)
+        self._tracing_action.setToolTip("Record how long every step takes for every frame")
+        self._tracing_action.setChecked(tracing.enabled())
+        tools_menu.addAction(self._tracing_action)
+        self._save_trace_action = QAction("&Save Trace", self, triggered=self.save_trace)
+        self._save_trace_action.setToolTip("Save the recorded spans as a chrome trace (chrome://tracing, Perfetto)")
+        tools_menu.addAction(self._save_trace_action)
+
         # add About menu
         about_menu = self.menuBar().addMenu("&About")
         about_qt_action = QAction("About &Qt", self, triggered=qApp.aboutQt)  # type: ignore
@@ -166,35 +212,89 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self._tab_widget)
 
         # initialize thread that connects to the webcam
-        self.webcam_thread = WebcamThread()  # python thread
+        self.webcam_thread = WebcamThread(open_source(args.source))  # python thread
         self._camera_viewfinder.setScaledContents(False)  # we scale ourselves
         self._camera_viewfinder.setMinimumSize(1, 1)  # we set this to start window at smallest size
-        self._camera_viewfinder.setMaximumSize(
-            self.webcam_thread.width, self.webcam_thread.height - tool_bar.heightForWidth(self.webcam_thread.width)
-        )  # dont stretch beyond camera resolution
+        if self.webcam_thread.width and self.webcam_thread.height:  # network cameras that are down report 0x0
+            self.fit_viewfinder(self.webcam_thread.width, self.webcam_thread.height)
         self._camera_viewfinder.setAlignment(Qt.AlignCenter)  # center the image
 
+        # initialize and link thread that gets facial recognition results
+        self.recognition_thread = RecognitionThread(self.webcam_thread, args)  # python thread
+
+        # load the known subjects, they are refreshed from the server in the background
+        self.subject_registry = SubjectRegistry(self.recognition_thread.endpoint_pool)
+
         # initialize and link thread that updates camera view
-        self.main_video_thread = VideoThread(self.webcam_thread, self)  # Qt thread
+        self.main_video_thread = VideoThread(self.webcam_thread, self.subject_registry, self)  # Qt thread
         self.main_video_thread.finished.connect(self.close)  # type: ignore
         self.main_video_thread.updateFrame.connect(self.setImage)
 
-        # initialize and link thread that gets facial recognition results
-        self.recognition_thread = RecognitionThread(self.webcam_thread, args)  # python thread
-
         # initialize and link thread that processes the data and saves it locally or sends it to the api
-        self.logging_thread = LoggingThread(self.recognition_thread)  # python thread
+        self.logging_thread = LoggingThread(self.recognition_thread, self.subject_registry)  # python thread
 
         # add the camera to the main view
         self._tab_widget.addTab(self._camera_viewfinder, "Viewfinder")
-        self.setWindowTitle(f"EasyID viewer: Camera {WEBCAM_ID}")
+        self.setWindowTitle(f"EasyID viewer: {self.webcam_thread.source.name}")
         self.show_status_message(f"EasyID viewer: ({self.webcam_thread.width}x{self.webcam_thread.height})")
+
+        # show the state of the recognition rate controller in the status bar
+        self.statusBar().addPermanentWidget(self._recognition_status)
+        self._status_timer.timeout.connect(self.update_status)
+        self._status_timer.start(1000)  # every second
         # start all threads
         self.start_threads()
 
     def show_status_message(self, message):
         self.statusBar().showMessage(message, 5000)
 
+    @Slot(bool)
+    def set_profiling(self, enabled: bool) -> None:
+        if enabled:
+            self.profiler.start()
+        else:
+            self.profiler.stop()
+
+    def toggle_profiling(self, *_) -> None:
+        # signal handler, only flips the menu action so the work happens on the gui thread
+        self._profiling_action.setChecked(not self._profiling_action.isChecked())
+
+    @Slot(bool)
+    def set_tracing(self, enabled: bool) -> None:
+        tracing.set_enabled(enabled)
+
+    @Slot()
+    def save_trace(self) -> None:
+        self.show_status_message(f"Trace saved to {tracing.save()}")
+
+    def request_trace(self, *_) -> None:
+        # signal handler, like toggle_profiling
+        self._save_trace_action.trigger()
+
+    @Slot()
+    def update_status(self) -> None:
+        idle_monitor = self.webcam_thread.idle_monitor
+        if idle_monitor.is_idle:
+            self._recognition_status.setText(f"Recognition paused: {idle_monitor.status_message()}")
+        else:
+            self._recognition_status.setText(self.recognition_thread.rate_controller.status_message())
+        queues = [
+            self.webcam_thread.frame_queue,
+            self.recognition_thread.logging_queue,
+            self.logging_thread.export_queue,
+        ]
+        self._recognition_status.setToolTip(
+            "\n".join(
+                [
+                    self.webcam_thread.source.stats_message(),
+                    self.recognition_thread.endpoint_pool.summary(),
+                    f"Idle monitor: {idle_monitor.status_message()}",
+                ]
+                + [queue.stats_message() for queue in queues]
+                + ([self.recognition_thread.spool.stats_message()] if self.recognition_thread.spool is not None else [])
+            )
+        )
+
     @Slot()
     def take_picture(self, manual: bool = True) -> None:
         file_name = next_image_file_name(manual)
@@ -205,16 +305,43 @@ class MainWindow(QMainWindow):
             self._tab_widget.addTab(image_view, f"Manual Capture #{index}")
         else:
             self._tab_widget.addTab(image_view, f"Unidentified Person #{index}")
-            self._unidentified_person_alert.exec()
-            self._unidentified_person_audio.play()
+            self._unidentified_tabs.append(image_view)
+            # close the oldest unidentified tabs, the pictures stay on disk
+            while len(self._unidentified_tabs) > MAX_UNIDENTIFIED_TABS:
+                old_view = self._unidentified_tabs.pop(0)
+                if self._tab_widget.indexOf(old_view) != -1:
+                    self._tab_widget.removeTab(self._tab_widget.indexOf(old_view))
+                old_view.deleteLater()
+            self.alert("Unidentified Person", file_name)
         # self._tab_widget.setCurrentIndex(index)  # switch to new tab
 
+    def alert(self, message: str, file_name: str) -> None:
+        # non-blocking, the alert goes in the alerts list and the status bar
+        item = QListWidgetItem(f"{datetime.now().strftime('%H:%M:%S')} {message}")
+        item.setData(Qt.UserRole, file_name)
+        item.setToolTip(file_name)
+        self._alerts_list.insertItem(0, item)
+        while self._alerts_list.count() > MAX_ALERTS:
+            self._alerts_list.takeItem(self._alerts_list.count() - 1)
+        self.show_status_message(message)
+        if (
+            self._unidentified_person_audio.playbackState() != QMediaPlayer.PlaybackState.PlayingState
+            and time.time() - self.last_alert_sound_time > ALERT_SOUND_INTERVAL
+        ):
+            self.last_alert_sound_time = time.time()
+            self._unidentified_person_audio.play()
+
+    @Slot(QListWidgetItem)
+    def open_alert(self, item: QListWidgetItem) -> None:
+        QDesktopServices.openUrl(QUrl.fromLocalFile(item.data(Qt.UserRole)))
+
     @Slot()
     def start_threads(self) -> None:
         print("Starting...")
         self.webcam_thread.start()  # start webcam thread / connect to webcam
         self.main_video_thread.start()  # start video thread / update camera on gui
         self.recognition_thread.start()  # start recognition thread / get facial recognition results
+        self.subject_registry.start()  # start refreshing the known subjects
         self.logging_thread.start()  # start logging thread / process data to save it locally or send it to the api
         self._take_picture_action.setEnabled(True)  # enable take picture button
 
@@ -222,10 +349,15 @@ class MainWindow(QMainWindow):
     def kill_threads(self) -> None:
         print("Finishing...")
         self._take_picture_action.setEnabled(False)
+        self._status_timer.stop()
+        self.profiler.stop()
+        if tracing.enabled():
+            tracing.save()
         # stop logging thread
         self.logging_thread.stop()
         # stop recognition
         self.recognition_thread.stop()
+        self.subject_registry.stop()
         # stop the video thread
         self.main_video_thread.stop()
         # stop the webcam thread
@@ -235,16 +367,30 @@ class MainWindow(QMainWindow):
         self.kill_threads()  # kill threads then aceept the close event (close app)
         event.accept()
 
-    @Slot(QPixmap, bool)
-    def setImage(self, pixmap: QPixmap, unidentified_subject: bool) -> None:
+    @Slot(QPixmap, object, int, float)
+    def fit_viewfinder(self, width: int, height: int) -> None:
+        self._frame_size = (width, height)
+        self._camera_viewfinder.setMaximumSize(
+            width, height - self._tool_bar.heightForWidth(width)
+        )  # dont stretch beyond camera resolution
+
+    def setImage(self, pixmap: QPixmap, new_strangers: List[int], frame_id: int, emitted_at: float) -> None:
+        tracing.record("updateFrame", frame_id, emitted_at)  # waiting for the gui thread to get to us
+        if (pixmap.width(), pixmap.height()) != self._frame_size:  # first frame of a camera that was down, or resized
+            self.fit_viewfinder(pixmap.width(), pixmap.height())
         # re-scale the pixmap based on the size of the label (video output thing)
-        self._video_pixmap = pixmap.scaled(self._camera_viewfinder.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self._camera_viewfinder.setPixmap(self._video_pixmap)
-        if not unidentified_subject and time.time() - self.last_unidentified_time > 1:
+        with tracing.span("setImage", frame_id):
+            self._video_pixmap = pixmap.scaled(
+                self._camera_viewfinder.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+            )
+            self._camera_viewfinder.setPixmap(self._video_pixmap)
+        if not new_strangers and time.time() - self.last_unidentified_time > 1:
             self.last_unidentified_time = time.time()
-        elif unidentified_subject and time.time() - self.last_unidentified_time > UNIDENTIFIED_SUBJECTS_TIMEOUT:
+        elif new_strangers and time.time() - self.last_unidentified_time > UNIDENTIFIED_SUBJECTS_TIMEOUT:
             self.last_unidentified_time = time.time()
             self.take_picture(manual=False)
+            # the strangers in this frame, the video thread may be on newer results by now
+            self.main_video_thread.remember_strangers(new_strangers)  # don't alert on them again for a while
 
 
 def next_image_file_name(manual: bool = True) -> str:
@@ -272,7 +418,14 @@ def main() -> None:
     if SELF_SIGNED_CERT_DIR is not None:
         os.environ["REQUESTS_CA_BUNDLE"] = str(SELF_SIGNED_CERT_DIR)
     app = QApplication(sys.argv)
+    if args.trace:
+        tracing.set_enabled(True)
     main_win = MainWindow()
+    if args.profile:
+        main_win.toggle_profiling()
+    if hasattr(signal, "SIGUSR1"):  # not available on windows
+        signal.signal(signal.SIGUSR1, main_win.toggle_profiling)
+        signal.signal(signal.SIGUSR2, main_win.request_trace)
     available_geometry = main_win.screen().availableGeometry()
     main_win.resize(available_geometry.width() / 3, available_geometry.height() / 2)
     main_win.show()
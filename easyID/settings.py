@@ -2,6 +2,11 @@
 from pathlib import Path
 
 UNIDENTIFIED_SUBJECTS_TIMEOUT = 5  # seconds
+UNIDENTIFIED_DEDUPE_WINDOW = 300  # seconds a stranger we already alerted on stays quiet after they were last seen
+UNIDENTIFIED_HASH_DISTANCE = 10  # max differing bits (of 64) between face hashes of the same stranger
+MAX_UNIDENTIFIED_TABS = 20  # the oldest unidentified person tabs are closed after this many
+MAX_ALERTS = 100  # entries kept in the alerts list
+ALERT_SOUND_INTERVAL = 10  # seconds, alerts closer together than this share one sound
 SIMILARITY_THRESHOLD = 0.8  # 80% similarity
 NUMBER_OF_SUBJECTS = 5  # number of subjects to be recognized
 DETECTION_PROBABILITY_THRESHOLD = 0.90  # 90% probability of a face
@@ -10,7 +15,7 @@ DEFAULT_DIRECTORY = Path.home() / "easyID"
 CF_OPTIONS = {
     "limit": NUMBER_OF_SUBJECTS,
     "det_prob_threshold": DETECTION_PROBABILITY_THRESHOLD,
-    "prediction_count": 1,
+    "prediction_count": NUMBER_OF_SUBJECTS,  # candidates per face, the best is used, all of them go to the event log
     # "face_plugins": "",  # if you want age and gender, add "age,gender" to this list.
     "status": False,
 }
@@ -18,6 +23,8 @@ CF_OPTIONS = {
 WEBCAM_ID = 0
 WEBCAM_WIDTH = 960
 WEBCAM_HEIGHT = 720
+WEBCAM_FOURCC = "MJPG"  # compressed, usb cameras only manage low frame rates in raw YUV at high resolutions
+WEBCAM_FPS = 30  # None keeps the camera's default
 
 DEFAULT_HOST = "https://easyid-server.local"
 DEFAULT_PORT = "443"
@@ -26,3 +33,79 @@ API_KEY = "14f0d188-357e-4cfc-8f18-889267120116"
 SELF_SIGNED_CERT_DIR = Path("../easyID-server/main-nginx/nginx-selfsigned.crt")
 ADD_TIMESTAMP = True
 MUTE_ALERTS = False
+
+# recognition rate control
+RECOGNITION_TIMEOUT = 5  # seconds before a recognize request is abandoned
+RECOGNITION_TARGET_LATENCY = 0.5  # seconds, we slow down and shrink frames to stay under this
+RECOGNITION_MIN_INTERVAL = 0.0  # seconds between requests while the server keeps up
+RECOGNITION_MAX_INTERVAL = 2.0  # seconds between requests while the server is overloaded
+RECOGNITION_MIN_SCALE = 0.5  # smallest fraction of the webcam resolution sent to the server
+RECOGNITION_MAX_ERROR_RATE = 0.2  # 20% of requests failing counts as overloaded
+RECOGNITION_BACKOFF_BASE = 0.5  # seconds, first retry delay after a failed request
+RECOGNITION_BACKOFF_MAX = 30  # seconds, longest retry delay while the server is down
+FRAME_QUALITY_WINDOW = 0.3  # seconds, the sharpest / best exposed frame of this window is sent, 0 sends every frame
+
+# store-and-forward, frames seen while the server is down are kept on disk and recognized once it's back
+RECOGNITION_SPOOL = True
+SPOOL_DIRECTORY = DEFAULT_DIRECTORY / "Spool"
+SPOOL_MAX_MB = 200  # the oldest spooled frames are deleted past this
+SPOOL_MIN_INTERVAL = 1.0  # seconds between spooled frames
+SPOOL_DEDUPE_WINDOW = 30  # seconds a spooled frame keeps similar frames out of the spool
+SPOOL_HASH_DISTANCE = 6  # max differing bits (of 64) between frame hashes that count as similar
+SPOOL_SCALE = 0.5  # fraction of the webcam resolution that's spooled
+SPOOL_JPEG_QUALITY = 80
+SPOOL_DRAIN_RATE = 2.0  # spooled frames sent per second once the server is back, on top of the live frames
+SPOOL_BATCH_SIZE = 20  # spooled frames read at a time
+
+# offline recognition, uses the OpenCV YuNet face detector and SFace recognizer with a local gallery of subjects
+LOCAL_RECOGNITION = False  # use the local gallery while the server is unreachable
+LOCAL_RECOGNITION_FIRST = False  # try the local gallery first and skip the server for confident matches
+LOCAL_FIRST_SIMILARITY = 0.95  # similarity needed to skip the server
+LOCAL_RECOGNITION_INTERVAL = 0.2  # seconds between local recognitions while the server is unreachable
+LOCAL_COSINE_THRESHOLD = 0.363  # SFace cosine score that means "same person", reported as SIMILARITY_THRESHOLD
+GALLERY_DIRECTORY = DEFAULT_DIRECTORY / "Gallery"
+FACE_DETECTION_MODEL = DEFAULT_DIRECTORY / "Models" / "face_detection_yunet_2023mar.onnx"
+FACE_RECOGNITION_MODEL = DEFAULT_DIRECTORY / "Models" / "face_recognition_sface_2021dec.onnx"
+
+# load balancing across several CompreFace servers (pass more than one --host)
+ENDPOINT_MAX_FAILURES = 3  # consecutive failures before a server is taken out of rotation
+ENDPOINT_COOLDOWN = 30  # seconds before a server that was taken out of rotation is tried again
+ENDPOINT_HEALTH_INTERVAL = 10  # seconds between health checks
+ENDPOINT_HEDGE_PERCENTILE = None  # e.g. 95 resends requests slower than a server's p95 latency to a second server
+ENDPOINT_LATENCY_WINDOW = 200  # number of recent requests used for the latency percentiles
+
+# hand-offs between threads are bounded, each has a policy for when it's full: "drop_oldest", "drop_newest",
+# "coalesce" (merge into the newest item) or "block" (wait for the next thread to catch up)
+FRAME_QUEUE_SIZE = 1  # webcam -> recognition
+FRAME_QUEUE_POLICY = "drop_oldest"  # always recognize the freshest frame, "block" would also stall the viewfinder
+LOGGING_QUEUE_SIZE = 256  # recognition -> logging, in recognition results
+LOGGING_QUEUE_POLICY = "drop_oldest"
+EXPORT_QUEUE_SIZE = 60  # logging -> exporter, in minutes of results
+EXPORT_QUEUE_POLICY = "coalesce"  # merge minutes together instead of losing them when the exporter stalls
+
+# local copy of the subjects on the server, for instant lookups and warm starts
+SUBJECT_CACHE_FILE = DEFAULT_DIRECTORY / "subjects_cache.txt"
+SUBJECT_REFRESH_INTERVAL = 600  # seconds between checks for new / removed subjects
+
+# on-demand profiler (--profile, SIGUSR1 or Tools > Profiling)
+PROFILE_DIRECTORY = DEFAULT_DIRECTORY / "Profiles"
+PROFILER_SAMPLE_INTERVAL = 0.01  # seconds between stack samples of every thread
+PROFILER_SNAPSHOT_INTERVAL = 60  # seconds between memory snapshots / writing results
+PROFILER_GROWTH_SNAPSHOTS = 3  # allocation sites growing in this many snapshots in a row are flagged
+
+# append-only binary log of every recognition result, for re-scoring attendance (scripts/rescore_events.py)
+EVENT_LOG = True
+EVENT_LOG_DIRECTORY = DEFAULT_DIRECTORY / "Events"
+EVENT_LOG_FLUSH_INTERVAL = 2.0  # seconds between batched writes
+EVENT_LOG_QUEUE_SIZE = 1024  # logging -> event log writer, in recognition results
+EVENT_LOG_QUEUE_POLICY = "drop_oldest"
+
+# per-frame tracing (--trace or Tools > Tracing), saved with Tools > Save Trace or SIGUSR2
+TRACING = False
+TRACE_BUFFER_SIZE = 50000  # spans kept, about a minute at 30 fps
+TRACE_DIRECTORY = DEFAULT_DIRECTORY / "Traces"
+
+# idle mode, the kiosk slows down when nobody has been around for a while
+IDLE_TIMEOUT = 300  # seconds without faces before going idle
+IDLE_FPS = 2  # webcam frames per second while idle, motion wakes it up within one of these frames
+IDLE_MOTION_THRESHOLD = 0.01  # fraction of the frame that has to change between idle frames to wake up
@@ -0,0 +1,55 @@
+# this thread writes every recognition result to the event log, in batches so the disk isn't touched for every frame
+from datetime import datetime
+from pathlib import Path
+from queue import Empty
+from threading import Event, Thread
+from typing import List, Tuple
+
+from easyID.classes.bounded_queue import BoundedQueue
+from easyID.classes.event_log import EventLogWriter
+from easyID.classes.recognition_result import RecognitionResult
+from easyID.settings import EVENT_LOG_DIRECTORY, EVENT_LOG_FLUSH_INTERVAL, EVENT_LOG_QUEUE_POLICY, EVENT_LOG_QUEUE_SIZE
+
+
+class EventLogThread:
+    """Collects results for EVENT_LOG_FLUSH_INTERVAL seconds and appends them to the event log in one write."""
+
+    def __init__(self, directory: Path = EVENT_LOG_DIRECTORY) -> None:
+        self._stop: Event = Event()
+        self._main_thread: Thread = Thread(target=self.run, name="EventLogThread")
+        self.writer: EventLogWriter = EventLogWriter(directory)
+        # time, results of one frame
+        self.queue: BoundedQueue[tuple[datetime, list[RecognitionResult]]] = BoundedQueue(
+            "Event log", EVENT_LOG_QUEUE_SIZE, EVENT_LOG_QUEUE_POLICY
+        )
+
+    def start(self) -> None:
+        self._main_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.queue.close()
+        self._main_thread.join()
+        self._flush()  # whatever came in while we were stopping
+        print(f"Event log: {self.writer.written} results written to {self.writer.directory}")
+        print(self.queue.stats_message())
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            self._stop.wait(EVENT_LOG_FLUSH_INTERVAL)
+            self._flush()
+        print("Event Log Thread Exited")
+
+    def _flush(self) -> None:
+        batch: List[Tuple[datetime, List[RecognitionResult]]] = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        if len(batch) == 0:
+            return
+        try:
+            self.writer.write(batch)
+        except OSError as e:  # full disk, missing drive, ... the app keeps working without the event log
+            print("Error writing the event log: ", e)
@@ -1,42 +1,67 @@
 import csv
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
 from pathlib import Path
+from typing import Optional
 
+from easyID.classes import clock
 from easyID.classes.subject_record import SubjectRecord
 from easyID.settings import DEFAULT_DIRECTORY
 
 
+@dataclass(frozen=True)
+class Sightings:
+    """When a subject was first and last seen and how often, the same size however many sightings are merged."""
+
+    first: datetime
+    last: datetime
+    count: int
+
+    def merge(self, other: "Sightings") -> "Sightings":
+        return Sightings(min(self.first, other.first), max(self.last, other.last), self.count + other.count)
+
+
 class SpreadsheetExporter:
-    """Export data to a spreadsheet."""
+    """Export data to a spreadsheet, one file per day."""
 
     def __init__(self, folder_path: Path = DEFAULT_DIRECTORY / "Data") -> None:
         folder_path.mkdir(parents=True, exist_ok=True)
-        self.file_name: Path = get_file_name(folder_path)
+        self.folder_path: Path = folder_path
+        self.date: date = clock.now().date()
+        self.file_name: Path = get_file_name(folder_path, self.date)
         self.fieldnames = ["ID Number", "Last Name", "First Name", "Grade", "First Seen", "Last Seen", "Times Seen"]
         self.initialized = False
 
-    def export(self, records_and_times: dict[SubjectRecord, list[datetime]]) -> None:
-        with open(self.file_name, "w", newline="") as csvfile:
+    def export(self, records_and_sightings: dict[SubjectRecord, Sightings]) -> None:
+        if len(records_and_sightings) == 0:
+            return
+        # start a new file when the first record of a new day comes in, late records stay in the current file
+        records_date = min(sightings.first for sightings in records_and_sightings.values()).date()
+        if records_date > self.date:
+            self.date = records_date
+            self.file_name = get_file_name(self.folder_path, self.date)
+            self.initialized = False
+        with open(self.file_name, "a", newline="") as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, dialect="excel")
             if not self.initialized:
                 writer.writeheader()
                 self.initialized = True
-            for record, times in records_and_times.items():
+            for record, sightings in records_and_sightings.items():
                 writer.writerow(
                     {
                         "ID Number": record.id_number,
                         "Last Name": record.last_name,
                         "First Name": record.first_name,
                         "Grade": record.grade,
-                        "First Seen": times[0].strftime("%x %X"),
-                        "Last Seen": times[-1].strftime("%x %X"),
-                        "Times Seen": len(times),
+                        "First Seen": sightings.first.strftime("%x %X"),
+                        "Last Seen": sightings.last.strftime("%x %X"),
+                        "Times Seen": sightings.count,
                     }
                 )
 
 
-def get_file_name(root_dir: Path) -> Path:
-    date_string = datetime.now().strftime("%Y%m%d")
+def get_file_name(root_dir: Path, day: Optional[date] = None) -> Path:
+    date_string = (day or clock.now().date()).strftime("%Y%m%d")
     pattern = f"easyID_log_{date_string}{{}}.csv"
     n = 0
     while True:
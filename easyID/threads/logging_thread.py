@@ -3,10 +3,16 @@ import datetime
 import time
 from queue import Empty
 from threading import Thread
+from typing import Optional
 
+from easyID.classes import clock, tracing
+from easyID.classes.bounded_queue import BoundedQueue
 from easyID.classes.recognition_result import RecognitionResult
 from easyID.classes.subject_record import SubjectRecord
-from easyID.threads.exporters.export_to_spreadsheet import SpreadsheetExporter
+from easyID.classes.subject_registry import SubjectRegistry
+from easyID.settings import EVENT_LOG, EXPORT_QUEUE_POLICY, EXPORT_QUEUE_SIZE
+from easyID.threads.event_log_thread import EventLogThread
+from easyID.threads.exporters.export_to_spreadsheet import Sightings, SpreadsheetExporter
 from easyID.threads.recognition_thread import RecognitionThread
 
 
@@ -16,77 +22,135 @@ class LoggingThread:
     Another thread either exports the results to a file or sends them to the api.
     """
 
-    def __init__(self, recognition_thread: RecognitionThread) -> None:
+    def __init__(
+        self,
+        recognition_thread: RecognitionThread,
+        subject_registry: SubjectRegistry,
+        export_class: Optional[SpreadsheetExporter] = None,
+        event_log_thread: Optional[EventLogThread] = None,
+    ) -> None:
         self._stop: bool = False
-        self._receiving_thread: Thread = Thread(target=self._receiver)
-        self._exporting_thread: Thread = Thread(target=self._export_data)
+        self._receiving_thread: Thread = Thread(target=self._receiver, name="LoggingReceiverThread")
+        self._exporting_thread: Thread = Thread(target=self._export_data, name="LoggingExporterThread")
 
         self._recognition_thread: RecognitionThread = recognition_thread
+        self._subject_registry: SubjectRegistry = subject_registry
+        # minutes that are still being filled in, only the current and previous minute unless timestamps are late.
         # {datetime to the minute: {SubjectRecord: list[all seconds seen]}}
         self._pending_results: dict[datetime.datetime, dict[SubjectRecord, list[int]]] = {}
+        # finished minutes waiting for the exporter, coalesced minutes keep one Sightings per subject
+        self.export_queue: BoundedQueue[dict[SubjectRecord, Sightings]] = BoundedQueue(
+            "Export", EXPORT_QUEUE_SIZE, EXPORT_QUEUE_POLICY, coalesce=merge_sightings
+        )
         # export class
-        self.export_class = SpreadsheetExporter()
+        self.export_class = export_class if export_class is not None else SpreadsheetExporter()
+        self.export_latency: float = 0.0  # seconds the last export took
+        # every result, matching or not, for re-scoring later, see settings
+        self.event_log_thread: Optional[EventLogThread] = event_log_thread
+        if self.event_log_thread is None and EVENT_LOG:
+            self.event_log_thread = EventLogThread()
+
+    @property
+    def pending_minutes(self) -> int:
+        return len(self._pending_results)
 
     def start(self) -> None:
         self._receiving_thread.start()
         self._exporting_thread.start()
+        if self.event_log_thread is not None:
+            self.event_log_thread.start()
 
     def stop(self) -> None:
         self._stop = True
+        self.export_queue.close()
+        self._receiving_thread.join()  # wait for receiver to stop
         self._exporting_thread.join()  # wait for exporter to stop
-        for minute_ts, results in self._pending_results.keys():  # export remaining data on shutdown.
-            final_subject_info = get_real_timestamps(minute_ts, results)
-            self.export_class.export(final_subject_info)
+        if self.event_log_thread is not None:
+            self.event_log_thread.stop()
+        # export remaining data on shutdown.
+        while True:
+            try:
+                self.export_class.export(self.export_queue.get_nowait())
+            except Empty:
+                break
+        for minute_ts in list(self._pending_results.keys()):
+            self.export_class.export(get_sightings(minute_ts, self._pending_results.pop(minute_ts)))
+        print(self.export_queue.stats_message())
 
     def _receiver(self) -> None:
         while not self._stop:
             if not self._recognition_thread.running:
                 print("Recognition Thread not running, exiting Logging Thread")
-                self.stop()
+                self._stop = True
                 break
-            try:  # timestamp is datetime, results is a non-empty list of RecognitionResult
-                timestamp, results = self._recognition_thread.logging_queue.get(timeout=1)  # 1 second timeout
+            self._queue_finished_minutes()
+            try:  # timestamp is datetime, results is a non-empty list of RecognitionResult, frame_id is for tracing
+                timestamp, results, frame_id = self._recognition_thread.logging_queue.get(timeout=1)
             except Empty:
                 continue
-            filtered_results: list[RecognitionResult] = [
-                result for result in results if result.is_matching and result.subject is not None
-            ]
-            if len(filtered_results) == 0:
-                continue
-            subjects: list[SubjectRecord] = [SubjectRecord.from_string(result.subject) for result in filtered_results]
-            minute_timestamp = timestamp_to_minute(timestamp)
-            if minute_timestamp not in self._pending_results:
-                self._pending_results[minute_timestamp] = {}
-            seconds = timestamp.second
-            for subject in subjects:
-                if subject not in self._pending_results[minute_timestamp]:
-                    self._pending_results[minute_timestamp][subject] = []
-                self._pending_results[minute_timestamp][subject].append(seconds)
+            with tracing.span("log results", frame_id):
+                if self.event_log_thread is not None:
+                    self.event_log_thread.queue.put((timestamp, results))
+                self._add_results(timestamp, results)
         print("Logging Receiving Thread Exited")
 
+    def _add_results(self, timestamp: datetime.datetime, results: list[RecognitionResult]) -> None:
+        filtered_results: list[RecognitionResult] = [
+            result for result in results if result.is_matching and result.subject is not None
+        ]
+        if len(filtered_results) == 0:
+            return
+        resolved_subjects = [self._subject_registry.resolve(result.subject) for result in filtered_results]
+        subjects: list[SubjectRecord] = [subject for subject in resolved_subjects if subject is not None]
+        minute_timestamp = timestamp_to_minute(timestamp)
+        if minute_timestamp not in self._pending_results:
+            self._pending_results[minute_timestamp] = {}
+        seconds = timestamp.second
+        for subject in subjects:
+            if subject not in self._pending_results[minute_timestamp]:
+                self._pending_results[minute_timestamp][subject] = []
+            self._pending_results[minute_timestamp][subject].append(seconds)
+
+    def _queue_finished_minutes(self) -> None:
+        # hand minutes older than a minute to the exporter, what happens when it's behind depends on EXPORT_QUEUE_POLICY
+        finished_before = clock.now() - datetime.timedelta(minutes=1)
+        for minute_ts in [minute_ts for minute_ts in self._pending_results.keys() if minute_ts <= finished_before]:
+            self.export_queue.put(get_sightings(minute_ts, self._pending_results.pop(minute_ts)))
+
     def _export_data(self) -> None:
         while not self._stop:
-            if len(self._pending_results) == 0:
-                time.sleep(1)
-                continue
-            oldest_minute = list(self._pending_results.keys())[0]
-            if oldest_minute > datetime.datetime.now() - datetime.timedelta(minutes=1):
-                time.sleep(1)
+            try:
+                final_subject_info = self.export_queue.get(timeout=1)
+            except Empty:
                 continue
-            minute_results: dict[SubjectRecord, list[int]] = self._pending_results.pop(oldest_minute)
-            final_subject_info = get_real_timestamps(oldest_minute, minute_results)
-            self.export_class.export(final_subject_info)
+            s_time = time.monotonic()
+            with tracing.span("export"):  # a minute of results from many frames
+                self.export_class.export(final_subject_info)
+            self.export_latency = time.monotonic() - s_time
         print("Logging Exporting Thread Exited")
 
 
-def get_real_timestamps(
+def get_sightings(
     minute_timestamp: datetime.datetime, result_seconds: dict[SubjectRecord, list[int]]
-) -> dict[SubjectRecord, list[datetime.datetime]]:
+) -> dict[SubjectRecord, Sightings]:
     return {
-        result: [minute_timestamp + datetime.timedelta(seconds=second) for second in seconds]
+        result: Sightings(
+            minute_timestamp + datetime.timedelta(seconds=min(seconds)),
+            minute_timestamp + datetime.timedelta(seconds=max(seconds)),
+            len(seconds),
+        )
         for result, seconds in result_seconds.items()
     }
 
 
+def merge_sightings(
+    older: dict[SubjectRecord, Sightings], newer: dict[SubjectRecord, Sightings]
+) -> dict[SubjectRecord, Sightings]:
+    merged = dict(older)
+    for subject, sightings in newer.items():
+        merged[subject] = merged[subject].merge(sightings) if subject in merged else sightings
+    return merged
+
+
 def timestamp_to_minute(timestamp: datetime.datetime) -> datetime.datetime:
     return timestamp.replace(second=0, microsecond=0)
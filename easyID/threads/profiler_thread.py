@@ -0,0 +1,127 @@
+# This thread samples what every other thread is doing and tracks memory growth, it can be turned on and off at runtime
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Thread
+from types import FrameType
+from typing import Dict, List, Optional
+
+from easyID.settings import (
+    PROFILE_DIRECTORY,
+    PROFILER_GROWTH_SNAPSHOTS,
+    PROFILER_SAMPLE_INTERVAL,
+    PROFILER_SNAPSHOT_INTERVAL,
+)
+
+MAX_STACK_DEPTH = 64
+TOP_ALLOCATION_SITES = 25
+
+
+class ProfilerThread:
+    """
+    Samples the stacks of all threads every PROFILER_SAMPLE_INTERVAL seconds and counts them as collapsed stacks
+    ("thread;file:function;file:function count" lines, the input format of flamegraph.pl / speedscope).
+    It also takes a tracemalloc snapshot every PROFILER_SNAPSHOT_INTERVAL seconds and flags allocation sites that grew
+    in PROFILER_GROWTH_SNAPSHOTS snapshots in a row. Results are written to PROFILE_DIRECTORY.
+    """
+
+    def __init__(self, output_dir: Path = PROFILE_DIRECTORY) -> None:
+        self._output_dir: Path = output_dir
+        self._stop: Event = Event()
+        self._main_thread: Optional[Thread] = None
+        self._stacks: Counter[str] = Counter()
+        self._first_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._growth_streaks: Dict[str, int] = {}  # {allocation site: snapshots in a row it grew}
+        self._file_prefix: str = ""
+
+    @property
+    def running(self) -> bool:
+        return self._main_thread is not None and self._main_thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._file_prefix = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._stacks = Counter()
+        self._growth_streaks = {}
+        self._stop.clear()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._first_snapshot = self._last_snapshot = take_snapshot()
+        self._main_thread = Thread(target=self.run, name="ProfilerThread", daemon=True)
+        self._main_thread.start()
+        print(f"Profiler started, writing to {self._output_dir}")
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        assert self._main_thread is not None
+        self._main_thread.join()
+        self._check_memory()
+        self._write_stacks()
+        tracemalloc.stop()
+        print("Profiler stopped")
+
+    def run(self) -> None:
+        own_ident = threading.get_ident()
+        next_snapshot = time.monotonic() + PROFILER_SNAPSHOT_INTERVAL
+        while not self._stop.wait(PROFILER_SAMPLE_INTERVAL):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self._stacks[collapse_stack(thread_names.get(ident, str(ident)), frame)] += 1
+            if time.monotonic() >= next_snapshot:  # also write what we have so far, in case the app never stops
+                next_snapshot = time.monotonic() + PROFILER_SNAPSHOT_INTERVAL
+                self._check_memory()
+                self._write_stacks()
+
+    def _check_memory(self) -> None:
+        snapshot = take_snapshot()
+        assert self._last_snapshot is not None and self._first_snapshot is not None
+        growing: List[str] = []
+        streaks: Dict[str, int] = {}
+        for stat in snapshot.compare_to(self._last_snapshot, "lineno"):
+            if stat.size_diff > 0:
+                site = str(stat.traceback[0])
+                streaks[site] = self._growth_streaks.get(site, 0) + 1
+                if streaks[site] >= PROFILER_GROWTH_SNAPSHOTS:
+                    growing.append(site)
+        self._growth_streaks = streaks  # sites that didn't grow this time start over
+        self._last_snapshot = snapshot
+
+        lines = [f"Memory report {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]
+        lines.append(f"\nSites that grew in the last {PROFILER_GROWTH_SNAPSHOTS}+ snapshots:")
+        lines.extend(f"  {site} ({streaks[site]} snapshots)" for site in growing)
+        lines.append("\nLargest growth since profiling started:")
+        lines.extend(f"  {stat}" for stat in snapshot.compare_to(self._first_snapshot, "lineno")[:TOP_ALLOCATION_SITES])
+        with open(self._output_dir / f"memory_{self._file_prefix}.txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        for site in growing:
+            print(f"Memory keeps growing at {site}")
+
+    def _write_stacks(self) -> None:
+        with open(self._output_dir / f"profile_{self._file_prefix}.collapsed", "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+def collapse_stack(thread_name: str, frame: Optional[FrameType]) -> str:
+    functions = []
+    while frame is not None and len(functions) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        functions.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join([thread_name.replace(" ", "_")] + functions[::-1])
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    # leave out the profiler's own allocations
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    )
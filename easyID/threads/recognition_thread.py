@@ -1,61 +1,176 @@
 # this thread contacts the CompreFace server and actually does the face recognition
 import time
 from datetime import datetime
-from queue import Queue
+from pathlib import Path
+from queue import Empty
 from threading import Thread
-from typing import Any
+from typing import Any, List, Optional
 
 import cv2
-from compreface import CompreFace
-from compreface.service import RecognitionService
-from requests import ConnectionError
+import numpy as np
+from requests import RequestException
 
+from easyID.classes import clock, tracing
+from easyID.classes.bounded_queue import BoundedQueue
+from easyID.classes.endpoint_pool import EndpointPool
+from easyID.classes.frame_quality import FrameSelector, frame_quality
+from easyID.classes.local_gallery import LocalRecognizer, load_local_recognizer
+from easyID.classes.rate_controller import ControllerState, RateController
 from easyID.classes.recognition_result import RecognitionResult, process_rec_results
-from easyID.settings import CF_OPTIONS
+from easyID.classes.recognition_spool import RecognitionSpool
+from easyID.classes.stranger_index import stranger_hashes
+from easyID.settings import (
+    LOCAL_FIRST_SIMILARITY,
+    LOCAL_RECOGNITION,
+    LOCAL_RECOGNITION_FIRST,
+    LOCAL_RECOGNITION_INTERVAL,
+    LOGGING_QUEUE_POLICY,
+    LOGGING_QUEUE_SIZE,
+    RECOGNITION_SPOOL,
+    SPOOL_DIRECTORY,
+)
+from easyID.threads.spool_thread import SpoolThread
 from easyID.threads.webcam_thread import WebcamThread
 
 
 class RecognitionThread:
-    def __init__(self, webcam_thread: WebcamThread, args: Any) -> None:
+    def __init__(self, webcam_thread: WebcamThread, args: Any, spool_directory: Path = SPOOL_DIRECTORY) -> None:
         self._stop: bool = False
         self.running: bool = False
-        self._main_thread: Thread = Thread(target=self.run)
+        self._main_thread: Thread = Thread(target=self.run, name="RecognitionThread")
 
         self._webcam_thread: WebcamThread = webcam_thread
-        self.compre_face: CompreFace = CompreFace(
-            args.host,
-            args.port,
-            CF_OPTIONS,
-        )
-        self.recognition: RecognitionService = self.compre_face.init_face_recognition(args.api_key)
-        self.logging_queue: Queue[tuple[datetime, list[RecognitionResult]]] = Queue()  # time, subjects at said time.
+        self.endpoint_pool: EndpointPool = EndpointPool(args.api_key, args.host, args.port)
+        self.rate_controller: RateController = RateController()
+        # picks the frame to send out of every window
+        self.frame_selector: FrameSelector = FrameSelector(fps=webcam_thread.fps)
+        self.local_recognizer: Optional[LocalRecognizer] = None  # used when the server is down, see settings
+        if LOCAL_RECOGNITION or LOCAL_RECOGNITION_FIRST:
+            self.local_recognizer = load_local_recognizer()
+        self.logging_queue: BoundedQueue[tuple[datetime, list[RecognitionResult], int]] = BoundedQueue(
+            "Logging", LOGGING_QUEUE_SIZE, LOGGING_QUEUE_POLICY
+        )  # time, subjects at said time, tracing id of the frame they're from.
+        self.spool: Optional[RecognitionSpool] = None  # frames seen while the server was down, see settings
+        self.spool_thread: Optional[SpoolThread] = None
+        if RECOGNITION_SPOOL:
+            self.spool = RecognitionSpool(spool_directory)
+            self.spool_thread = SpoolThread(self.spool, self.endpoint_pool, self.rate_controller, self.logging_queue)
 
     def start(self) -> None:
         self.running = True
+        self.endpoint_pool.start()
         self._main_thread.start()
+        if self.spool_thread is not None:
+            self.spool_thread.start()
 
     def stop(self) -> None:
         self._stop = True
+        self.logging_queue.close()
         self._main_thread.join()  # wait for webcam thread to stop
+        if self.spool_thread is not None:
+            self.spool_thread.stop()
+        self.endpoint_pool.stop()
+        print(self.endpoint_pool.summary())
+        print(self.logging_queue.stats_message())
+        print(self.frame_selector.stats_message())
 
     def run(self) -> None:
-        last_frame = None
-        while self._webcam_thread.cap.isOpened() and not self._stop:
-            if self._webcam_thread.frame is not None and self._webcam_thread.frame is not last_frame:
-                last_frame = self._webcam_thread.frame
-                _, im_buf_arr = cv2.imencode(".jpg", last_frame)  # convert frame to jpg image
+        last_local_time = 0.0
+        idle_monitor = self._webcam_thread.idle_monitor
+        while self._webcam_thread.source.is_opened and not self._stop:
+            if idle_monitor.is_idle:  # nobody around, don't bother the server until the webcam sees motion
+                idle_monitor.wait_until_active(timeout=0.1)
+                continue
+            try:  # frames that arrive while we're busy are dropped / kept according to FRAME_QUEUE_POLICY
+                frame_id, frame = self._webcam_thread.frame_queue.get(timeout=0.1)
+                # score every frame, the faces are probably still where they were in the last results
+                with tracing.span("score", frame_id):
+                    score = frame_quality(frame, self._webcam_thread.results)
+                    self.frame_selector.offer(frame, score, frame_id=frame_id)
+            except Empty:
+                pass
+            server_ready = self.rate_controller.ready()
+            offline = self.rate_controller.state == ControllerState.OFFLINE
+            local_ready = (
+                self.local_recognizer is not None
+                and offline
+                and time.monotonic() - last_local_time >= LOCAL_RECOGNITION_INTERVAL
+            )
+            if not self.frame_selector.ready():
+                continue
+            if not (server_ready or local_ready):
+                if offline and self.spool is not None:  # keep the best frame of every window for later
+                    selected = self.frame_selector.take()
+                    if selected is not None:
+                        self._spool_frame(selected[0], None, selected[2])
+                continue
+            selected = self.frame_selector.take()
+            if selected is None:
+                continue
+            frame, _, frame_id = selected
+            local_results: Optional[List[RecognitionResult]] = None
+            if self.local_recognizer is not None and (offline or LOCAL_RECOGNITION_FIRST):
+                last_local_time = time.monotonic()
+                with tracing.span("local recognize", frame_id):
+                    local_results = self.local_recognizer.recognize(frame)
+                if not server_ready:  # still waiting to reconnect, the local results are all we have
+                    self._publish_results(local_results, frame_id, frame)
+                    self._spool_frame(frame, local_results, frame_id)
+                    continue
+                if LOCAL_RECOGNITION_FIRST and is_confident(local_results):  # no need to ask the server
+                    self._publish_results(local_results, frame_id, frame)
+                    continue
+            scale = self.rate_controller.scale
+            with tracing.span("encode", frame_id):
+                sent_frame = frame
+                if scale < 1.0:  # the server is struggling, send a smaller frame
+                    sent_frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                _, im_buf_arr = cv2.imencode(".jpg", sent_frame)  # convert frame to jpg image
                 byte_im = im_buf_arr.tobytes()  # jpg image in bytes
-                try:
-                    data = self.recognition.recognize(byte_im)
-                except ConnectionError as e:
-                    print("Error Connecting to Server: ", e)
-                    break
-                self._webcam_thread.results = process_rec_results(data.get("result"))
-                if len(self._webcam_thread.results) > 0:
-                    self.logging_queue.put((datetime.now(), self._webcam_thread.results))
-            else:
-                # print("Recognition Thread sleeping for 5ms")
-                time.sleep(0.005)  # 5 ms
+            self.rate_controller.submitted()
+            s_time = time.monotonic()
+            try:
+                with tracing.span("recognize request", frame_id):
+                    data = self.endpoint_pool.recognize(byte_im)
+            except RequestException as e:
+                retry_in = self.rate_controller.record_failure()
+                print(f"Error Connecting to Server, retrying in {retry_in:.1f}s: ", e)
+                # the last results are of people who may have left by now, don't keep showing them
+                self._publish_results(local_results if local_results is not None else [], frame_id, frame)
+                self._spool_frame(frame, local_results, frame_id)
+                continue
+            self.rate_controller.record_success(time.monotonic() - s_time)
+            if offline:
+                print("Reconnected to Server")
+            with tracing.span("process results", frame_id):
+                results = process_rec_results(data.get("result"), scale)
+            self._publish_results(results, frame_id, frame)
         # on exit:
         self.running = False
         print("Recognition Thread Exited")
+
+    def _publish_results(self, results: List[RecognitionResult], frame_id: int, frame: np.ndarray) -> None:
+        # hashed from the frame the results came from, nothing is drawn on it. Set before the results, so the video
+        # thread never pairs new results with old hashes
+        self._webcam_thread.results_stranger_hashes = stranger_hashes(frame, results)
+        self._webcam_thread.results_frame_id = frame_id
+        self._webcam_thread.results = results
+        if len(results) > 0:
+            self._webcam_thread.idle_monitor.faces_seen()
+            with tracing.span("logging queue put", frame_id):
+                self.logging_queue.put((clock.now(), results, frame_id))
+
+    def _spool_frame(self, frame: np.ndarray, local_results: Optional[List[RecognitionResult]], frame_id: int) -> None:
+        if self.spool is None:
+            return
+        if local_results is not None and any(result.is_matching for result in local_results):
+            return  # already logged from the local gallery
+        with tracing.span("spool", frame_id):
+            self.spool.add(frame, clock.now())
+
+
+def is_confident(results: List[RecognitionResult]) -> bool:
+    return len(results) > 0 and all(
+        result.is_matching and result.similarity is not None and result.similarity >= LOCAL_FIRST_SIMILARITY
+        for result in results
+    )
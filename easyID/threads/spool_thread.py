@@ -0,0 +1,75 @@
+# this thread recognizes the frames spooled while the server was down, once it's back
+from datetime import datetime
+from threading import Event, Thread
+
+from requests import RequestException
+
+from easyID.classes import tracing
+from easyID.classes.bounded_queue import BoundedQueue
+from easyID.classes.endpoint_pool import EndpointPool
+from easyID.classes.rate_controller import ControllerState, RateController
+from easyID.classes.recognition_result import RecognitionResult, process_rec_results
+from easyID.classes.recognition_spool import RecognitionSpool
+from easyID.settings import SPOOL_BATCH_SIZE, SPOOL_DRAIN_RATE, SPOOL_SCALE
+
+
+class SpoolThread:
+    """
+    Sends spooled frames to the server oldest first while it's reachable, at SPOOL_DRAIN_RATE frames per second or
+    slower if the rate controller is spacing out the live requests. The results go to the logging thread with the
+    time the frame was captured. A frame is only removed from the spool once it was recognized.
+    """
+
+    def __init__(
+        self,
+        spool: RecognitionSpool,
+        endpoint_pool: EndpointPool,
+        rate_controller: RateController,
+        logging_queue: BoundedQueue[tuple[datetime, list[RecognitionResult], int]],
+    ) -> None:
+        self._stop: Event = Event()
+        self._main_thread: Thread = Thread(target=self.run, name="SpoolThread")
+        self.spool: RecognitionSpool = spool
+        self._endpoint_pool: EndpointPool = endpoint_pool
+        self._rate_controller: RateController = rate_controller
+        self._logging_queue: BoundedQueue[tuple[datetime, list[RecognitionResult], int]] = logging_queue
+
+    def start(self) -> None:
+        self._main_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._main_thread.join()
+        print(self.spool.stats_message())
+
+    def _can_drain(self) -> bool:
+        return len(self.spool) > 0 and self._rate_controller.state != ControllerState.OFFLINE
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            if not self._can_drain():
+                self._stop.wait(1)
+                continue
+            for path, timestamp in self.spool.peek(SPOOL_BATCH_SIZE):
+                if self._stop.is_set() or not self._can_drain():
+                    break
+                try:
+                    image = path.read_bytes()
+                except OSError:  # evicted while we were busy
+                    self.spool.remove(path)
+                    continue
+                try:
+                    with tracing.span("spooled recognize request"):
+                        data = self._endpoint_pool.recognize(image)
+                except RequestException as e:
+                    print("Error sending spooled frame, trying again later: ", e)
+                    self._stop.wait(1)
+                    break
+                results = process_rec_results(data.get("result"), SPOOL_SCALE)
+                if len(results) > 0:
+                    self._logging_queue.put((timestamp, results, 0))  # not a live frame, nothing to trace
+                self.spool.remove(path)
+                if len(self.spool) == 0:
+                    print(f"Spool drained, {self.spool.drained} frames recognized")
+                self._stop.wait(max(1 / SPOOL_DRAIN_RATE, self._rate_controller.interval))
+        print("Spool Thread Exited")
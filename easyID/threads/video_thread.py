@@ -1,42 +1,57 @@
 # This Thread Interacts with the GUI Directly
 
 import sys
+import threading
+import time
 from datetime import datetime
+from typing import List
 
 import cv2
 from PySide6.QtCore import QThread, Signal
 from PySide6.QtGui import QImage, QPixmap
 
+from easyID.classes import tracing
+from easyID.classes.stranger_index import StrangerIndex
+from easyID.classes.subject_registry import SubjectRegistry
 from easyID.settings import ADD_TIMESTAMP
 from easyID.threads.webcam_thread import WebcamThread
 
 
 # this thread is used to capture frames from the webcam
 class VideoThread(QThread):
-    updateFrame = Signal(QPixmap, bool)
+    # frame, hashes of strangers we haven't alerted on, tracing frame id, time it was emitted
+    updateFrame = Signal(QPixmap, object, int, float)
 
-    def __init__(self, webcam_thread: WebcamThread, parent=None) -> None:
+    def __init__(self, webcam_thread: WebcamThread, subject_registry: SubjectRegistry, parent=None) -> None:
         QThread.__init__(self, parent)
         self._stop: bool = False
         self.webcam_thread: WebcamThread = webcam_thread
+        self.subject_registry: SubjectRegistry = subject_registry
+        self.stranger_index: StrangerIndex = StrangerIndex()  # strangers we alerted on, so we alert once per person
 
     def stop(self) -> None:
         self._stop = True
         self.exit()
 
     def run(self) -> None:
+        threading.current_thread().name = "VideoThread"  # so the profiler can tell which thread this is
         prev_frame = None
         prev_results = None
-        unknown_subjects = False
-        while self.webcam_thread.cap.isOpened() and not self._stop:
+        stranger_hashes: List[int] = []  # hashes of the unknown faces in the latest results
+        while self.webcam_thread.source.is_opened and not self._stop:
             frame = self.webcam_thread.frame
+            frame_id = self.webcam_thread.frame_id
             results = self.webcam_thread.results
             if frame is not None and (frame is not prev_frame or results is not prev_results):
+                draw_start = time.perf_counter()
+                if results is not prev_results:
+                    stranger_hashes = self.webcam_thread.results_stranger_hashes
+                    frame_id = self.webcam_thread.results_frame_id  # trace how long the results took to show up
                 if ADD_TIMESTAMP:  # put timestamp on frame
                     cv2.putText(
                         img=frame,
                         text=str(datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-4]),
-                        org=(20, self.webcam_thread.height - 10),
+                        org=(20, frame.shape[0] - 10),
                         fontFace=cv2.FONT_HERSHEY_PLAIN,
                         fontScale=1,
                         color=(255, 255, 255),
@@ -74,7 +89,12 @@ class VideoThread(QThread):
                             )
 
                         if result.subject and result.is_matching:
-                            subject = f"Subject: {result.subject}"
+                            record = self.subject_registry.resolve(result.subject)
+                            if record is not None:
+                                grade = "Teacher" if record.is_teacher else f"Grade {record.grade}"
+                                subject = f"Subject: {record.first_name} {record.last_name} ({grade})"
+                            else:
+                                subject = f"Subject: {result.subject}"
                             similarity = f"Similarity: {result.similarity}"
                             cv2.putText(
                                 frame,
@@ -95,7 +115,6 @@ class VideoThread(QThread):
                                 1,
                             )
                         else:
-                            unknown_subjects = True
                             subject = "No known faces"
                             cv2.putText(
                                 frame,
@@ -113,19 +132,30 @@ class VideoThread(QThread):
                 gui_pixmap = QPixmap.fromImage(
                     QImage(
                         frame.data,
-                        self.webcam_thread.width,
-                        self.webcam_thread.height,
-                        3 * self.webcam_thread.width,
+                        frame.shape[1],
+                        frame.shape[0],
+                        3 * frame.shape[1],
                         QImage.Format_RGB888,
                     ).rgbSwapped()
                 )
-                self.updateFrame.emit(gui_pixmap, unknown_subjects)
+                tracing.record("draw", frame_id, draw_start)
+                # checked on every frame, once the gui alerted on them they're known and stop being new
+                new_strangers = [
+                    face_hash for face_hash in stranger_hashes if not self.stranger_index.is_known(face_hash)
+                ]
+                self.updateFrame.emit(gui_pixmap, new_strangers, frame_id, time.perf_counter())
                 # update / reset variables
-                unknown_subjects = False
                 prev_frame = frame
                 prev_results = results
+            elif self.webcam_thread.idle_monitor.is_idle:  # new frames only come in a few times a second
+                self.msleep(50)
             else:
                 # print("Video Thread Sleeping for  5ms")
                 self.msleep(5)  # sleep for 5 ms
         # on exit:
         print("VideoThread exited")
+
+    def remember_strangers(self, stranger_hashes: List[int]) -> None:
+        """Called from the gui thread once we alerted on these strangers, they won't count as new for a while."""
+        for face_hash in stranger_hashes:
+            self.stranger_index.add(face_hash)
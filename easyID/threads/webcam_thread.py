@@ -1,45 +1,98 @@
 # this thread contacts the CompreFace server and actually does the face recognition
+import time
 from threading import Thread
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from easyID.classes import tracing
+from easyID.classes.bounded_queue import BoundedQueue
+from easyID.classes.frame_source import CameraSource, FrameSource
+from easyID.classes.idle_monitor import IdleMonitor
 from easyID.classes.recognition_result import RecognitionResult
-from easyID.settings import WEBCAM_HEIGHT, WEBCAM_ID, WEBCAM_WIDTH
+from easyID.settings import FRAME_QUEUE_POLICY, FRAME_QUEUE_SIZE, IDLE_FPS
+
+# frames are flipped / copied into these in turn instead of a new array every frame. The video thread draws the
+# timestamp and boxes on the viewfinder's frame, so the recognition thread gets its own clean copy from a second ring.
+VIEW_BUFFERS = 3  # the viewfinder's frame, the one the video thread is still drawing on, the one being flipped
+QUEUE_BUFFERS = FRAME_QUEUE_SIZE + 2  # the queued frames, the one being scored, the one being copied
 
 
 class WebcamThread:
-    def __init__(self) -> None:
+    def __init__(self, source: Optional[FrameSource] = None) -> None:
         self._stop: bool = False
-        self._main_thread: Thread = Thread(target=self.run)
-
-        self.cap = cv2.VideoCapture(WEBCAM_ID)
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)
-        # override the default resolution
-        if WEBCAM_WIDTH is not None and WEBCAM_HEIGHT is not None:
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, WEBCAM_WIDTH)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, WEBCAM_HEIGHT)
-        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
-        self.frame: Optional[np.ndarray] = None
+        self._main_thread: Thread = Thread(target=self.run, name="WebcamThread")
+
+        self.source: FrameSource = source if source is not None else CameraSource()
+        self.width = self.source.width
+        self.height = self.source.height
+        self.fps = self.source.fps
+        self.frame: Optional[np.ndarray] = None  # latest frame, for the viewfinder
+        self.frame_id: int = 0  # tracing id of the latest frame
+        # (frame id, frame) waiting for recognition
+        self.frame_queue: BoundedQueue[Tuple[int, np.ndarray]] = BoundedQueue(
+            "Frame", FRAME_QUEUE_SIZE, FRAME_QUEUE_POLICY
+        )
         self.results: List[RecognitionResult] = []  # we have this here for simplicity, but it could be moved.
+        self.results_frame_id: int = 0  # tracing id of the frame the results came from
+        self.results_stranger_hashes: List[int] = []  # hashes of the unknown faces in results, see StrangerIndex
+        self.idle_monitor: IdleMonitor = IdleMonitor()  # shared with the recognition and video threads
+        self._view_buffers: List[np.ndarray] = []
+        self._queue_buffers: List[np.ndarray] = []
+        self._next_view_buffer: int = 0
+        self._next_queue_buffer: int = 0
 
     def start(self) -> None:
         self._main_thread.start()
 
     def stop(self) -> None:
         self._stop = True
+        self.frame_queue.close()
         self._main_thread.join()  # wait for webcam thread to stop
-        self.cap.release()
+        self.source.release()
+        print(self.source.stats_message())
+        print(self.frame_queue.stats_message())
+        print(f"Idle monitor: {self.idle_monitor.status_message()}")
 
     def run(self) -> None:
-        while self.cap.isOpened() and not self._stop:
-            (status, frame_raw) = self.cap.read()
-            self.frame = cv2.flip(frame_raw, 1)
+        while self.source.is_opened and not self._stop:
+            frame_id = tracing.next_frame_id()
+            with tracing.span("capture", frame_id):
+                frame_raw = self.source.read()
+            if frame_raw is None:  # a dropped frame or a network camera reconnecting
+                time.sleep(0.05)
+                continue
+            with tracing.span("flip", frame_id):
+                frame = self._flip(frame_raw)
+            with tracing.span("frame queue put", frame_id):
+                queued = self._queued_copy(frame)  # before the video thread can see the frame and draw on it
+                self.frame_queue.put((frame_id, queued))
+            self.frame = frame
+            self.frame_id = frame_id
+            with tracing.span("motion check", frame_id):
+                self.idle_monitor.update_frame(queued)  # the viewfinder's frame may already have boxes on it
+            if self.idle_monitor.is_idle:  # nobody around, only look every now and then
+                time.sleep(1 / IDLE_FPS)
             # print("frame updated")
         # on exit:
         self.frame = None
         self.results = []
+        self.results_stranger_hashes = []
         print("Webcam Thread Exited")
+
+    def _flip(self, frame: np.ndarray) -> np.ndarray:
+        if not self._view_buffers or self._view_buffers[0].shape != frame.shape:  # first frame, or a new resolution
+            self._view_buffers = [np.empty_like(frame) for _ in range(VIEW_BUFFERS)]
+            self.height, self.width = frame.shape[:2]
+        buffer = self._view_buffers[self._next_view_buffer]
+        self._next_view_buffer = (self._next_view_buffer + 1) % VIEW_BUFFERS
+        return cv2.flip(frame, 1, dst=buffer)
+
+    def _queued_copy(self, frame: np.ndarray) -> np.ndarray:
+        if not self._queue_buffers or self._queue_buffers[0].shape != frame.shape:
+            self._queue_buffers = [np.empty_like(frame) for _ in range(QUEUE_BUFFERS)]
+        buffer = self._queue_buffers[self._next_queue_buffer]
+        self._next_queue_buffer = (self._next_queue_buffer + 1) % QUEUE_BUFFERS
+        np.copyto(buffer, frame)
+        return buffer
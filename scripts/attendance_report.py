@@ -0,0 +1,310 @@
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from easyID.classes.subject_record import SubjectRecord
+from easyID.settings import DEFAULT_DIRECTORY
+
+# Attendance reports over the daily logs written by the app (easyID_log_YYYYMMDD*.csv).
+# The logs are first rolled up into one row per log file, day and subject (first seen, last seen, times seen),
+# kept as a numpy array next to a manifest of the logs it contains. Only new or changed logs are read on later runs,
+# so reports over a whole year are answered from the roll-up in well under a second.
+# Rows of logs that were deleted stay in the roll-up, use --rebuild to start over.
+
+ROLLUP_FILE = "rollup.npy"
+MANIFEST_FILE = "manifest.json"
+LOG_PATTERN = "easyID_log_*.csv"
+ROLLUP_DTYPE = np.dtype(
+    [
+        ("file", np.uint32),  # index into the manifest's files
+        ("day", np.int32),  # days since 1970-01-01
+        ("subject", np.uint32),  # index into the manifest's subjects
+        ("first", np.int32),  # seconds since midnight
+        ("last", np.int32),
+        ("count", np.uint32),
+    ]
+)
+EPOCH = date(1970, 1, 1)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("report", help="Report to print", choices=["attendance", "tardiness", "grades", "update"])
+    parser.add_argument(
+        "--log-dir", help="Directory of the app's logs", type=str, default=str(DEFAULT_DIRECTORY / "Data")
+    )
+    parser.add_argument(
+        "--rollup-dir", help="Where the roll-up is kept", type=str, default=str(DEFAULT_DIRECTORY / "Rollup")
+    )
+    parser.add_argument("--rebuild", help="Throw away the roll-up and read every log again", action="store_true")
+    parser.add_argument("--start", help="First day of the report, YYYY-MM-DD", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", help="Last day of the report, YYYY-MM-DD", type=date.fromisoformat, default=None)
+    parser.add_argument(
+        "--grade", help="Only include these grades (13 for teachers)", type=int, nargs="+", default=None
+    )
+    parser.add_argument("--late-after", help="Arriving after this time (HH:MM) is late", type=str, default="08:00")
+    parser.add_argument("--output", help="Write the report to this csv file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+class Rollup:
+    def __init__(self, rows: np.ndarray, files: Dict[str, Dict[str, float]], subjects: List[str]) -> None:
+        self.rows: np.ndarray = rows
+        self.files: Dict[str, Dict[str, float]] = files  # {file name: {"id", "size", "mtime"}}
+        self.subjects: List[str] = subjects  # subject strings, the position is the subject index
+        self._subject_index: Dict[str, int] = {subject: i for i, subject in enumerate(subjects)}
+        self._column_index: Dict[Tuple[str, str, str, str], int] = {}  # log columns -> subject index
+        self.records: List[SubjectRecord] = [SubjectRecord.from_string(subject) for subject in subjects]
+
+    @classmethod
+    def empty(cls) -> "Rollup":
+        return cls(np.empty(0, dtype=ROLLUP_DTYPE), {}, [])
+
+    @classmethod
+    def load(cls, directory: Path) -> "Rollup":
+        if not (directory / MANIFEST_FILE).exists():
+            return cls.empty()
+        with open(directory / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        return cls(np.load(directory / ROLLUP_FILE), manifest["files"], manifest["subjects"])
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        # write to temp files first so an interrupted update never leaves a broken roll-up behind
+        np.save(directory / f"{ROLLUP_FILE}.tmp.npy", self.rows)
+        with open(directory / f"{MANIFEST_FILE}.tmp", "w") as f:
+            json.dump({"files": self.files, "subjects": self.subjects}, f)
+        os.replace(directory / f"{ROLLUP_FILE}.tmp.npy", directory / ROLLUP_FILE)
+        os.replace(directory / f"{MANIFEST_FILE}.tmp", directory / MANIFEST_FILE)
+
+    def update(self, log_dir: Path) -> int:
+        """Reads logs that are new or changed since the last update, returns how many were read."""
+        new_rows = []
+        changed_ids = []
+        for path in sorted(log_dir.glob(LOG_PATTERN)):
+            stat = path.stat()
+            entry = self.files.get(path.name)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+            if entry is None:  # ids are never reused, so rows of deleted logs stay valid
+                entry = {"id": max((e["id"] for e in self.files.values()), default=-1) + 1}
+            else:  # the log of the current day keeps growing, replace what we had from it
+                changed_ids.append(entry["id"])
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+            self.files[path.name] = entry
+            new_rows.append(self._read_log(path, int(entry["id"])))
+        if changed_ids:
+            self.rows = self.rows[~np.isin(self.rows["file"], changed_ids)]
+        if new_rows:
+            self.rows = np.concatenate([self.rows] + new_rows)
+        return len(new_rows)
+
+    def _read_log(self, path: Path, file_id: int) -> np.ndarray:
+        # one row per day and subject, a log can have several rows for the same minute / subject
+        days: Dict[Tuple[int, int], List[int]] = {}  # {(day, subject): [first, last, count]}
+        with open(path, newline="") as csvfile:
+            for row in csv.DictReader(csvfile, dialect="excel"):
+                try:
+                    subject = self._subject_id(row["Last Name"], row["First Name"], row["ID Number"], row["Grade"])
+                    day, first = parse_timestamp(row["First Seen"])
+                    _, last = parse_timestamp(row["Last Seen"])
+                    count = int(row["Times Seen"])
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Skipping invalid row in {path.name}: {e}")
+                    continue
+                key = (day, subject)
+                if key in days:
+                    info = days[key]
+                    info[0], info[1], info[2] = min(info[0], first), max(info[1], last), info[2] + count
+                else:
+                    days[key] = [first, last, count]
+        rows = np.empty(len(days), dtype=ROLLUP_DTYPE)
+        rows["file"] = file_id
+        rows["day"] = [day for day, _ in days.keys()]
+        rows["subject"] = [subject for _, subject in days.keys()]
+        rows["first"] = [info[0] for info in days.values()]
+        rows["last"] = [info[1] for info in days.values()]
+        rows["count"] = [info[2] for info in days.values()]
+        return rows
+
+    def _subject_id(self, last_name: str, first_name: str, id_number: str, grade: str) -> int:
+        columns = (last_name, first_name, id_number, grade)
+        if columns not in self._column_index:  # every student is only parsed once per run
+            record = SubjectRecord(last_name, first_name, id_number, int(grade))
+            subject = record.std_subject_name()
+            if subject not in self._subject_index:
+                self._subject_index[subject] = len(self.subjects)
+                self.subjects.append(subject)
+                self.records.append(record)
+            self._column_index[columns] = self._subject_index[subject]
+        return self._column_index[columns]
+
+    def daily(
+        self, start: Optional[date] = None, end: Optional[date] = None, grades: Optional[List[int]] = None
+    ) -> np.ndarray:
+        """One row per day and subject present, combining the logs of days the app was restarted on."""
+        rows = self.rows
+        if start is not None:
+            rows = rows[rows["day"] >= (start - EPOCH).days]
+        if end is not None:
+            rows = rows[rows["day"] <= (end - EPOCH).days]
+        if grades is not None:
+            subject_grades = np.array([record.grade for record in self.records], dtype=np.int32)
+            rows = rows[np.isin(subject_grades[rows["subject"]], grades)]
+        if len(rows) == 0:
+            return rows
+        rows = rows[np.lexsort((rows["subject"], rows["day"]))]
+        starts = np.flatnonzero(
+            np.concatenate(([True], (np.diff(rows["day"]) != 0) | (np.diff(rows["subject"].astype(np.int64)) != 0)))
+        )
+        daily = rows[starts].copy()
+        daily["first"] = np.minimum.reduceat(rows["first"], starts)
+        daily["last"] = np.maximum.reduceat(rows["last"], starts)
+        daily["count"] = np.add.reduceat(rows["count"], starts)
+        return daily
+
+
+def parse_timestamp(timestamp: str) -> Tuple[int, int]:
+    """
+    Parses the "%x %X" timestamps of the logs into (days since 1970, seconds since midnight).
+    strptime is slow, but a log only has one date and the same times come up over and over, so both halves are cached.
+    """
+    date_string, _, time_string = timestamp.partition(" ")
+    return parse_day(date_string), parse_seconds(time_string)
+
+
+@lru_cache(maxsize=1024)
+def parse_day(date_string: str) -> int:
+    return (datetime.strptime(date_string, "%x").date() - EPOCH).days
+
+
+@lru_cache(maxsize=86400)
+def parse_seconds(time_string: str) -> int:
+    parsed = datetime.strptime(time_string, "%X")
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def subject_columns(record: SubjectRecord) -> List[str]:
+    return [
+        record.id_number,
+        record.last_name,
+        record.first_name,
+        "Teacher" if record.is_teacher else str(record.grade),
+    ]
+
+
+def record_order(record: SubjectRecord) -> Tuple[int, str, str]:
+    """Sort key for report rows, by grade as a number so 9 comes before 10 and teachers (13) come last."""
+    return record.grade, record.last_name, record.first_name
+
+
+def attendance_report(rollup: Rollup, daily: np.ndarray) -> Tuple[List[str], List[List[str]]]:
+    school_days = len(np.unique(daily["day"]))
+    subjects, days_present = np.unique(daily["subject"], return_counts=True)
+    header = ["ID Number", "Last Name", "First Name", "Grade", "Days Present", "School Days", "Attendance"]
+    order = sorted(range(len(subjects)), key=lambda i: record_order(rollup.records[subjects[i]]))
+    rows = [
+        subject_columns(rollup.records[subjects[i]])
+        + [str(days_present[i]), str(school_days), f"{days_present[i] / school_days:.1%}"]
+        for i in order
+    ]
+    return header, rows
+
+
+def tardiness_report(rollup: Rollup, daily: np.ndarray, late_after: int) -> Tuple[List[str], List[List[str]]]:
+    minutes_late = np.maximum(daily["first"] - late_after, 0) / 60
+    late = minutes_late > 0
+    subjects, inverse = np.unique(daily["subject"], return_inverse=True)
+    days_present = np.bincount(inverse)
+    days_late = np.bincount(inverse, weights=late)
+    total_late = np.bincount(inverse, weights=minutes_late)
+    header = ["ID Number", "Last Name", "First Name", "Grade", "Days Present", "Days Late", "Average Minutes Late"]
+    order = sorted(range(len(subjects)), key=lambda i: (-days_late[i], record_order(rollup.records[subjects[i]])))
+    rows = [
+        subject_columns(rollup.records[subjects[i]])
+        + [str(days_present[i]), str(int(days_late[i])), f"{total_late[i] / max(days_late[i], 1):.1f}"]
+        for i in order
+    ]
+    return header, rows
+
+
+def grades_report(rollup: Rollup, daily: np.ndarray, late_after: int) -> Tuple[List[str], List[List[str]]]:
+    school_days = max(len(np.unique(daily["day"])), 1)
+    subject_grades = np.array([record.grade for record in rollup.records], dtype=np.int32)[daily["subject"]]
+    header = ["Grade", "Students", "Average Present Per Day", "Attendance", "Late Arrivals"]
+    rows = []
+    for grade in np.unique(subject_grades):
+        in_grade = daily[subject_grades == grade]
+        students = len(np.unique(in_grade["subject"]))
+        present_per_day = len(in_grade) / school_days
+        rows.append(
+            [
+                "Teacher" if grade == 13 else str(grade),
+                str(students),
+                f"{present_per_day:.1f}",
+                f"{present_per_day / students:.1%}",
+                f"{np.mean(in_grade['first'] > late_after):.1%}",
+            ]
+        )
+    return header, rows
+
+
+def print_table(header: List[str], rows: List[List[str]]) -> None:
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(header)]
+    print(" | ".join(column.ljust(width) for column, width in zip(header, widths)))
+    print("-+-".join("-" * width for width in widths))
+    for row in rows:
+        print(" | ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main() -> None:
+    args = parse_arguments()
+    rollup_dir = Path(args.rollup_dir)
+    s_time = time.monotonic()
+    rollup = Rollup.empty() if args.rebuild else Rollup.load(rollup_dir)
+    read = rollup.update(Path(args.log_dir))
+    if read > 0:
+        rollup.save(rollup_dir)
+        print(f"Read {read} new or changed logs in {time.monotonic() - s_time:.2f} Seconds")
+    if args.report == "update":
+        print(f"Roll-up has {len(rollup.rows)} rows from {len(rollup.files)} logs")
+        return
+
+    s_time = time.monotonic()
+    hour, minute = (int(part) for part in args.late_after.split(":"))
+    late_after = hour * 3600 + minute * 60
+    daily = rollup.daily(args.start, args.end, args.grade)
+    if len(daily) == 0:
+        print("Nobody was seen in that time")
+        return
+    if args.report == "attendance":
+        header, rows = attendance_report(rollup, daily)
+    elif args.report == "tardiness":
+        header, rows = tardiness_report(rollup, daily, late_after)
+    else:
+        header, rows = grades_report(rollup, daily, late_after)
+    first_day = EPOCH.toordinal() + int(daily["day"].min())
+    last_day = EPOCH.toordinal() + int(daily["day"].max())
+    print(f"{args.report.title()} from {date.fromordinal(first_day)} to {date.fromordinal(last_day)}\n")
+    print_table(header, rows)
+    print(f"\n{len(rows)} rows in {time.monotonic() - s_time:.3f} Seconds")
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile, dialect="excel")
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
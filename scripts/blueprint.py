@@ -13,7 +13,7 @@ from scripts.upload_subjects import UploadSubjects
 # You need to at least include the following columns:
 # Last Name, First Name, Subject ID(student ID), Internal ID, Grade, Images.
 # The order doesn't matter, but don't change the names of the rows.
-def parse_arguments() -> Tuple[Path, Path, str, str, str]:
+def parse_arguments() -> Tuple[Path, Path, str, List[str], List[str]]:
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
@@ -34,8 +34,10 @@ def parse_arguments() -> Tuple[Path, Path, str, str, str]:
         type=str,
         default=API_KEY,
     )
-    parser.add_argument("--host", help="CompreFace host", type=str, default=DEFAULT_HOST)
-    parser.add_argument("--port", help="CompreFace port", type=str, default=DEFAULT_PORT)
+    parser.add_argument("--host", help="CompreFace host(s)", type=str, nargs="+", default=[DEFAULT_HOST])
+    parser.add_argument(
+        "--port", help="CompreFace port, or one port per host", type=str, nargs="+", default=[DEFAULT_PORT]
+    )
 
     args = parser.parse_args()
 
@@ -113,12 +115,12 @@ class ParseBlueprintData:
 
 def main() -> None:
     # load args and process data
-    spreadsheet_path, photo_dir, api_key, host, port = parse_arguments()
+    spreadsheet_path, photo_dir, api_key, hosts, ports = parse_arguments()
     print(f"Processing spreadsheet: {spreadsheet_path}")
     blueprint_data = ParseBlueprintData(spreadsheet_path, photo_dir)
     blueprint_data.parse_subject_records()
     # load data into standardized upload script
-    upload_subjects = UploadSubjects(api_key, host, port)
+    upload_subjects = UploadSubjects(api_key, hosts, ports)
     upload_subjects.add_subjects(blueprint_data.subject_records)
     if input("Upload all subjects? (y/n): ").lower() == "y":
         # upload subjects
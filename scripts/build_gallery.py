@@ -0,0 +1,109 @@
+import argparse
+import os
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+import requests
+
+from easyID.classes.local_gallery import FaceEmbedder, normalize, write_gallery
+from easyID.settings import API_KEY, DEFAULT_HOST, DEFAULT_PORT, GALLERY_DIRECTORY, SELF_SIGNED_CERT_DIR
+from scripts.blueprint import ParseBlueprintData
+
+FACES_API = "/api/v1/recognition/faces"
+
+
+# builds the local gallery used for offline recognition, either from the blueprint export that was uploaded with
+# scripts.blueprint or from the face images already saved on the CompreFace server.
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--spreadsheet-path",
+        help="The location of the spreadsheet(csv) exported from blueprint, leave empty to use the server's images",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--photo-dir",
+        help="Directory where all the photos are located",
+        type=str,
+        default=str(Path(".")),
+    )
+    parser.add_argument(
+        "--api-key",
+        help="CompreFace recognition service API key",
+        type=str,
+        default=API_KEY,
+    )
+    parser.add_argument("--host", help="CompreFace host", type=str, default=DEFAULT_HOST)
+    parser.add_argument("--port", help="CompreFace port", type=str, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--dtype", help="How to store the embeddings", type=str, choices=["float16", "int8"], default="float16"
+    )
+    parser.add_argument("--output-dir", help="Where to write the gallery", type=str, default=str(GALLERY_DIRECTORY))
+
+    return parser.parse_args()
+
+
+def images_from_blueprint(spreadsheet_path: Path, photo_dir: Path) -> Iterator[Tuple[str, np.ndarray]]:
+    blueprint_data = ParseBlueprintData(spreadsheet_path, photo_dir)
+    blueprint_data.parse_subject_records()
+    for record in blueprint_data.subject_records:
+        yield record.std_subject_name(), cv2.imread(str(record.image_path))
+
+
+def images_from_server(api_key: str, host: str, port: str) -> Iterator[Tuple[str, np.ndarray]]:
+    faces_url = f"{host}:{port}{FACES_API}"
+    headers = {"x-api-key": api_key}
+    cur_page = 0
+    total_pages = 1
+    while cur_page < total_pages:
+        response = requests.get(f"{faces_url}?size=1000&page={cur_page}", headers=headers).json()
+        for face in response["faces"]:
+            image = requests.get(f"{faces_url}/{face['image_id']}/img", headers=headers).content
+            yield face["subject"], cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        cur_page = response["page_number"] + 1
+        total_pages = response["total_pages"]
+
+
+def main() -> None:
+    args = parse_arguments()
+    if SELF_SIGNED_CERT_DIR is not None:  # add self-signed certificate
+        os.environ["REQUESTS_CA_BUNDLE"] = str(SELF_SIGNED_CERT_DIR)
+    if args.spreadsheet_path is not None:
+        print(f"Processing spreadsheet: {args.spreadsheet_path}")
+        images = images_from_blueprint(Path(args.spreadsheet_path), Path(args.photo_dir))
+    else:
+        print(f"Downloading saved faces from {args.host}:{args.port}")
+        images = images_from_server(args.api_key, args.host, args.port)
+
+    embedder = FaceEmbedder()
+    subject_embeddings: Dict[str, List[np.ndarray]] = defaultdict(list)
+    s_time = datetime.now()
+    for subject_name, image in images:
+        if image is None:
+            print(f"Could not read the image for {subject_name}. Skipping.")
+            continue
+        faces = embedder.detect(image)
+        if len(faces) == 0:
+            print(f"No face found for {subject_name}. Skipping.")
+            continue
+        largest_face = faces[np.argmax(faces[:, 2] * faces[:, 3])][np.newaxis]  # subject photos have one person
+        subject_embeddings[subject_name].append(embedder.embed(image, largest_face)[0])
+
+    if len(subject_embeddings) == 0:
+        print("No faces found, the gallery was not written")
+        return
+    # subjects with several photos get the average of their embeddings
+    subjects = sorted(subject_embeddings.keys())
+    embeddings = normalize(np.vstack([np.mean(subject_embeddings[subject], axis=0) for subject in subjects]))
+    write_gallery(subjects, embeddings, Path(args.output_dir), args.dtype)
+    print(f"{len(subjects)} Subjects written to {args.output_dir} in {datetime.now() - s_time} Seconds")
+
+
+if __name__ == "__main__":
+    main()
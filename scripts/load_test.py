@@ -0,0 +1,214 @@
+import argparse
+import csv
+import os
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Thread
+from typing import List, Optional, Tuple
+
+import numpy as np
+from requests import RequestException
+
+from easyID.classes.endpoint_pool import EndpointPool
+from easyID.settings import (
+    API_KEY,
+    DEFAULT_DIRECTORY,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    RECOGNITION_MAX_ERROR_RATE,
+    RECOGNITION_TARGET_LATENCY,
+    SELF_SIGNED_CERT_DIR,
+)
+from scripts.mock_compreface import start_mock_servers
+
+
+# Finds out how many kiosks a CompreFace server can handle. Captured jpg frames are replayed through the same
+# recognize path the app uses, by a growing number of simulated kiosks. Each kiosk waits for a student to walk up
+# (random arrivals) and then sends a burst of frames back to back, like the recognition thread does while someone
+# is in view.
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--frames-dir",
+        help="Directory of captured jpg frames to replay",
+        type=str,
+        default=str(DEFAULT_DIRECTORY / "Pictures"),
+    )
+    parser.add_argument(
+        "--api-key",
+        help="CompreFace recognition service API key",
+        type=str,
+        default=API_KEY,
+    )
+    parser.add_argument("--host", help="CompreFace host(s)", type=str, nargs="+", default=[DEFAULT_HOST])
+    parser.add_argument(
+        "--port", help="CompreFace port, or one port per host", type=str, nargs="+", default=[DEFAULT_PORT]
+    )
+    parser.add_argument("--mock", help="Test against a local mock server instead", action="store_true")
+    parser.add_argument("--start", help="Number of kiosks in the first step", type=int, default=1)
+    parser.add_argument("--step", help="Kiosks added each step", type=int, default=1)
+    parser.add_argument("--max", help="Number of kiosks in the last step", type=int, default=12)
+    parser.add_argument("--step-duration", help="Seconds per step", type=float, default=30)
+    parser.add_argument("--arrival-rate", help="Students arriving per kiosk per second", type=float, default=0.5)
+    parser.add_argument("--burst-size", help="Average frames sent per student", type=float, default=5)
+    parser.add_argument(
+        "--target-latency", help="p95 latency target in seconds", type=float, default=RECOGNITION_TARGET_LATENCY
+    )
+    parser.add_argument("--output", help="Write the per step results to this csv file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+@dataclass(frozen=True)
+class StepResult:
+    kiosks: int
+    requests: int
+    errors: int
+    throughput: float  # successful requests per second
+    p50: Optional[float]
+    p95: Optional[float]
+    p99: Optional[float]
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests > 0 else 0.0
+
+
+class Kiosk:
+    def __init__(self, args: argparse.Namespace, frames: List[bytes], stop: Event) -> None:
+        self._frames: List[bytes] = frames
+        self._stop: Event = stop
+        self._arrival_rate: float = args.arrival_rate
+        self._burst_size: float = args.burst_size
+        self._main_thread: Thread = Thread(target=self.run)
+        # every kiosk is its own app instance, so it gets its own endpoint pool
+        self.endpoint_pool: EndpointPool = EndpointPool(args.api_key, args.host, args.port)
+        self.samples: List[Tuple[float, bool]] = []  # (latency, success)
+
+    def start(self) -> None:
+        self._main_thread.start()
+
+    def join(self) -> None:
+        self._main_thread.join()
+        self.endpoint_pool.stop()
+
+    def run(self) -> None:
+        while not self._stop.wait(random.expovariate(self._arrival_rate)):  # wait for the next student
+            for _ in range(max(1, np.random.poisson(self._burst_size))):
+                if self._stop.is_set():
+                    break
+                s_time = time.monotonic()
+                try:
+                    self.endpoint_pool.recognize(random.choice(self._frames))
+                    self.samples.append((time.monotonic() - s_time, True))
+                except RequestException:
+                    self.samples.append((time.monotonic() - s_time, False))
+
+
+def run_step(args: argparse.Namespace, frames: List[bytes], kiosk_count: int) -> StepResult:
+    stop = Event()
+    kiosks = [Kiosk(args, frames, stop) for _ in range(kiosk_count)]
+    for kiosk in kiosks:
+        kiosk.start()
+    time.sleep(args.step_duration)
+    stop.set()
+    for kiosk in kiosks:
+        kiosk.join()
+    samples = [sample for kiosk in kiosks for sample in kiosk.samples]
+    latencies = np.array([latency for latency, success in samples if success])
+    errors = sum(1 for _, success in samples if not success)
+
+    def percentile(p: float) -> Optional[float]:
+        return float(np.percentile(latencies, p)) if len(latencies) > 0 else None
+
+    return StepResult(
+        kiosk_count,
+        len(samples),
+        errors,
+        len(latencies) / args.step_duration,
+        percentile(50),
+        percentile(95),
+        percentile(99),
+    )
+
+
+def find_knee(results: List[StepResult]) -> Optional[StepResult]:
+    """
+    The step where adding kiosks stops adding throughput, the point of the throughput curve furthest from the
+    straight line between the first and last step.
+    """
+    if len(results) < 3:
+        return None
+    x = np.array([result.kiosks for result in results], dtype=np.float64)
+    y = np.array([result.throughput for result in results], dtype=np.float64)
+    x = (x - x[0]) / max(x[-1] - x[0], 1e-9)
+    y = (y - y.min()) / max(y.max() - y.min(), 1e-9)
+    distance = y - (y[0] + (y[-1] - y[0]) * x)
+    return results[int(np.argmax(distance))]
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return f"{seconds * 1000:.0f}" if seconds is not None else "-"
+
+
+def main() -> None:
+    args = parse_arguments()
+    if SELF_SIGNED_CERT_DIR is not None and not args.mock:  # add self-signed certificate
+        os.environ["REQUESTS_CA_BUNDLE"] = str(SELF_SIGNED_CERT_DIR)
+    frames = [path.read_bytes() for path in sorted(Path(args.frames_dir).glob("*.jpg"))]
+    if len(frames) == 0:
+        raise ValueError(f"No jpg frames found in {args.frames_dir}")
+    if args.mock:
+        server = start_mock_servers([0])[0]
+        args.host, args.port = [server.host], [server.port]
+    print(f"Replaying {len(frames)} frames against {', '.join(args.host)}")
+
+    results: List[StepResult] = []
+    print("Kiosks | Requests | Errors | Req/s  | p50 ms | p95 ms | p99 ms")
+    for kiosk_count in range(args.start, args.max + 1, args.step):
+        result = run_step(args, frames, kiosk_count)
+        results.append(result)
+        print(
+            f"{result.kiosks:6} | {result.requests:8} | {result.error_rate:6.1%} | {result.throughput:6.1f} | "
+            f"{format_ms(result.p50):>6} | {format_ms(result.p95):>6} | {format_ms(result.p99):>6}"
+        )
+
+    supported = [
+        result
+        for result in results
+        if result.p95 is not None
+        and result.p95 <= args.target_latency
+        and result.error_rate <= RECOGNITION_MAX_ERROR_RATE
+    ]
+    if supported:
+        print(f"\nUp to {supported[-1].kiosks} kiosks meet the {format_ms(args.target_latency)} ms p95 target")
+    else:
+        print(f"\nNo step met the {format_ms(args.target_latency)} ms p95 target")
+    knee = find_knee(results)
+    if knee is not None:
+        print(f"Throughput levels off at {knee.kiosks} kiosks ({knee.throughput:.1f} req/s)")
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile, dialect="excel")
+            writer.writerow(["Kiosks", "Requests", "Errors", "Error Rate", "Throughput", "p50", "p95", "p99"])
+            for result in results:
+                writer.writerow(
+                    [
+                        result.kiosks,
+                        result.requests,
+                        result.errors,
+                        result.error_rate,
+                        result.throughput,
+                        result.p50,
+                        result.p95,
+                        result.p99,
+                    ]
+                )
+
+
+if __name__ == "__main__":
+    main()
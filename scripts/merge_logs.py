@@ -0,0 +1,142 @@
+import argparse
+import csv
+import heapq
+import re
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from easyID.settings import DEFAULT_DIRECTORY
+from scripts.attendance_report import parse_timestamp
+
+# Combines the logs of several kiosks into one log per day. The logs of each kiosk are already in time order, so
+# they're streamed through a k-way merge, only one row per log and the students seen in the last --window seconds are
+# kept in memory. Sightings of the same student less than --window seconds apart are one row, even when they come
+# from different kiosks, the kiosks that saw them are listed in the Kiosks column.
+
+LOG_NAME_PATTERN = re.compile(r"^easyID_log_(?P<day>\d{8})(\(\d+\))?\.csv$")
+SUBJECT_FIELDS = ["ID Number", "Last Name", "First Name", "Grade"]
+FIELDNAMES = SUBJECT_FIELDS + ["First Seen", "Last Seen", "Times Seen", "Kiosks"]
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("kiosk_dirs", help="Log directory of every kiosk, named after the kiosk", type=str, nargs="+")
+    parser.add_argument(
+        "--output-dir", help="Where the merged logs are written", type=str, default=str(DEFAULT_DIRECTORY / "Merged")
+    )
+    parser.add_argument(
+        "--window", help="Sightings closer together than this (seconds) are one", type=float, default=300
+    )
+    parser.add_argument("--start", help="First day to merge, YYYY-MM-DD", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", help="Last day to merge, YYYY-MM-DD", type=date.fromisoformat, default=None)
+
+    return parser.parse_args()
+
+
+@dataclass
+class Visit:
+    subject: Tuple[str, ...]  # the SUBJECT_FIELDS of the student
+    first: int  # seconds since 1970-01-01, in local time
+    last: int
+    first_seen: str  # as written in the log
+    last_seen: str
+    count: int
+    kiosks: Dict[str, None] = field(default_factory=dict)  # ordered set
+
+    def row(self) -> Dict[str, str]:
+        return {
+            **dict(zip(SUBJECT_FIELDS, self.subject)),
+            "First Seen": self.first_seen,
+            "Last Seen": self.last_seen,
+            "Times Seen": str(self.count),
+            "Kiosks": "; ".join(self.kiosks),
+        }
+
+
+def find_logs(kiosk_dirs: List[Path]) -> Dict[str, List[Tuple[str, Path]]]:
+    """{YYYYMMDD: [(kiosk, log)]}, a kiosk can have several logs per day if the app was restarted."""
+    logs: Dict[str, List[Tuple[str, Path]]] = defaultdict(list)
+    for kiosk_dir in kiosk_dirs:
+        for path in sorted(kiosk_dir.glob("easyID_log_*.csv")):
+            match = LOG_NAME_PATTERN.match(path.name)
+            if match is not None:
+                logs[match["day"]].append((kiosk_dir.name, path))
+    return logs
+
+
+def read_sightings(kiosk: str, path: Path) -> Iterator[Tuple[int, str, Dict[str, str]]]:
+    with open(path, newline="") as csvfile:
+        for row in csv.DictReader(csvfile, dialect="excel"):
+            try:
+                day, seconds = parse_timestamp(row["First Seen"])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping invalid row in {kiosk}/{path.name}: {e}")
+                continue
+            yield day * 86400 + seconds, kiosk, row
+
+
+def merge_day(logs: List[Tuple[str, Path]], window: float, writer: csv.DictWriter) -> Tuple[int, int]:
+    """Merges the logs of one day, returns (rows read, rows written)."""
+    rows_in = rows_out = 0
+    # students seen in the last window seconds, the least recently seen first
+    visits: "OrderedDict[Tuple[str, ...], Visit]" = OrderedDict()
+    merged = heapq.merge(*(read_sightings(kiosk, path) for kiosk, path in logs), key=itemgetter(0))
+    for first, kiosk, row in merged:
+        rows_in += 1
+        while visits and next(iter(visits.values())).last + window < first:  # they left, write them out
+            writer.writerow(visits.popitem(last=False)[1].row())
+            rows_out += 1
+        try:
+            _, last_seconds = parse_timestamp(row["Last Seen"])
+            count = int(row["Times Seen"])
+            subject = tuple(row[name] for name in SUBJECT_FIELDS)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping invalid row from {kiosk}: {e}")
+            continue
+        last = first - first % 86400 + last_seconds
+        visit: Optional[Visit] = visits.get(subject)
+        if visit is not None and visit.last + window < first:  # came back after the window, that's a new visit
+            writer.writerow(visits.pop(subject).row())
+            rows_out += 1
+            visit = None
+        if visit is None:
+            visit = Visit(subject, first, last, row["First Seen"], row["Last Seen"], 0)
+            visits[subject] = visit
+        else:
+            visits.move_to_end(subject)
+        if last > visit.last:
+            visit.last, visit.last_seen = last, row["Last Seen"]
+        visit.count += count
+        visit.kiosks[kiosk] = None
+    for visit in visits.values():
+        writer.writerow(visit.row())
+        rows_out += 1
+    return rows_in, rows_out
+
+
+def main() -> None:
+    args = parse_arguments()
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logs = find_logs([Path(kiosk_dir) for kiosk_dir in args.kiosk_dirs])
+    total_in = total_out = 0
+    for day in sorted(logs.keys()):
+        log_date = datetime.strptime(day, "%Y%m%d").date()
+        if (args.start is not None and log_date < args.start) or (args.end is not None and log_date > args.end):
+            continue
+        with open(output_dir / f"easyID_log_{day}.csv", "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, dialect="excel")
+            writer.writeheader()
+            rows_in, rows_out = merge_day(logs[day], args.window, writer)
+        total_in, total_out = total_in + rows_in, total_out + rows_out
+        print(f"{day}: {len(logs[day])} logs, {rows_in} rows merged into {rows_out}")
+    print(f"Merged {total_in} rows into {total_out}, written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import BoundedSemaphore, Thread
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from easyID.classes.recognition_client import RECOGNIZE_API
+
+# A stand-in CompreFace server for testing the app, the load balancer and the load generator without the real thing.
+# It answers recognize requests after a random delay, with one face and prediction_count random known subjects.
+# Workers limits how many requests are processed at the same time, like the real server's cpu would.
+
+MOCK_SUBJECTS = [f"Student, Test{n} ({100000 + n}) [{9 + n % 4}]" for n in range(50)]
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--port", help="Port(s) to listen on, one server per port", type=int, nargs="+", default=[8000])
+    parser.add_argument("--latency", help="Average processing time per request in seconds", type=float, default=0.1)
+    parser.add_argument("--workers", help="Requests processed at the same time", type=int, default=4)
+    parser.add_argument("--error-rate", help="Fraction of requests that fail with a 500", type=float, default=0.0)
+
+    return parser.parse_args()
+
+
+class MockCompreFace(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.1, workers: int = 4, error_rate: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", port), MockRequestHandler)
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.workers: BoundedSemaphore = BoundedSemaphore(workers)
+        self.requests: int = 0
+
+    @property
+    def host(self) -> str:
+        return f"http://{self.server_address[0]}"
+
+    @property
+    def port(self) -> str:
+        return str(self.server_address[1])
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    server: MockCompreFace
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.startswith(RECOGNIZE_API):
+            self._reply(404, {"message": "Not found"})
+            return
+        self.server.requests += 1
+        with self.server.workers:  # wait for a free "cpu"
+            time.sleep(random.expovariate(1 / self.server.latency) if self.server.latency > 0 else 0)
+        if random.random() < self.server.error_rate:
+            self._reply(500, {"message": "Mock server error"})
+            return
+        box = {"probability": 0.99, "x_min": 200, "y_min": 150, "x_max": 400, "y_max": 400}
+        prediction_count = int(parse_qs(urlparse(self.path).query).get("prediction_count", ["1"])[0])
+        prediction_count = min(prediction_count, len(MOCK_SUBJECTS))
+        similarities = sorted((random.uniform(0.6, 1.0) for _ in range(prediction_count)), reverse=True)
+        subjects = [
+            {"subject": subject, "similarity": round(similarity, 5)}
+            for subject, similarity in zip(random.sample(MOCK_SUBJECTS, prediction_count), similarities)
+        ]
+        self._reply(200, {"result": [{"box": box, "subjects": subjects}]})
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/api/v1/recognition/subjects"):
+            self._reply(200, {"subjects": MOCK_SUBJECTS})
+        elif self.path.startswith("/api/v1/recognition/faces"):
+            self._reply(200, {"faces": [], "page_number": 0, "total_pages": 0})
+        else:
+            self._reply(404, {"message": "Not found"})
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # don't print every request
+
+
+def start_mock_servers(
+    ports: List[int], latency: float = 0.1, workers: int = 4, error_rate: float = 0.0
+) -> List[MockCompreFace]:
+    """Starts mock servers in background threads, port 0 picks a free port."""
+    servers = []
+    for port in ports:
+        server = MockCompreFace(port, latency, workers, error_rate)
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def main() -> None:
+    args = parse_arguments()
+    servers = start_mock_servers(args.port, args.latency, args.workers, args.error_rate)
+    for server in servers:
+        print(f"Mock CompreFace listening on {server.host}:{server.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
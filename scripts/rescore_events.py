@@ -0,0 +1,147 @@
+import argparse
+import csv
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from easyID.classes.event_log import (
+    EVENT_TOP_K,
+    attendance,
+    best_similarities,
+    load_events,
+    load_subjects,
+    logged_days,
+)
+from easyID.classes.subject_record import SubjectRecord
+from easyID.settings import EVENT_LOG_DIRECTORY, SIMILARITY_THRESHOLD
+from scripts.attendance_report import print_table, subject_columns
+
+# Re-scores the event log written by the app (every recognition result with its top candidates) with other settings.
+# "sweep" shows how many faces would have matched and how many students would have been marked present for every
+# threshold / number of candidates, compared to the current SIMILARITY_THRESHOLD. "attendance" writes the logs the app
+# would have written with one threshold, one row per student and day.
+# The events are memory mapped and scored with numpy, so millions of events take seconds.
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("report", help="What to do", choices=["sweep", "attendance"])
+    parser.add_argument("--event-dir", help="Directory of the event log", type=str, default=str(EVENT_LOG_DIRECTORY))
+    parser.add_argument("--start", help="First day, YYYY-MM-DD", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", help="Last day, YYYY-MM-DD", type=date.fromisoformat, default=None)
+    parser.add_argument(
+        "--threshold",
+        help="Similarity threshold(s), sweep defaults to 0.50 to 0.95",
+        type=float,
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--top-k",
+        help=f"Candidates per face that can match (1 to {EVENT_TOP_K}), 1 is what the app does",
+        type=int,
+        nargs="+",
+        default=[1],
+    )
+    parser.add_argument("--output", help="Write the sweep / attendance to this csv file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def load_days(directory: Path, start: Optional[date], end: Optional[date]) -> List[Tuple[date, np.ndarray]]:
+    days = [day for day in logged_days(directory) if (start is None or day >= start) and (end is None or day <= end)]
+    return [(day, load_events(day, directory)) for day in days]
+
+
+def best_by_day(days: List[Tuple[date, np.ndarray]], subject_count: int, top_k: int) -> np.ndarray:
+    """(days, subjects) best similarity of every subject on every day."""
+    return np.stack([best_similarities(events, subject_count, top_k) for _, events in days])
+
+
+def sweep(
+    days: List[Tuple[date, np.ndarray]], subject_count: int, thresholds: List[float], top_ks: List[int]
+) -> Tuple[List[str], List[List[str]]]:
+    # candidates are sorted best first, so a face matches anything at all if its first candidate does
+    face_best = np.sort(
+        np.concatenate([np.nan_to_num(events["similarities"][:, 0], nan=-np.inf) for _, events in days])
+    )
+    baseline = best_by_day(days, subject_count, 1) > SIMILARITY_THRESHOLD
+    header = ["Threshold", "Top K", "Matched Faces", "Matched", "Student Days", "Gained", "Lost"]
+    rows = []
+    for top_k in top_ks:
+        best = best_by_day(days, subject_count, top_k)
+        for threshold in thresholds:
+            matched = len(face_best) - int(np.searchsorted(face_best, threshold, side="right"))
+            present = best > threshold
+            rows.append(
+                [
+                    f"{threshold:.3f}" + (" (current)" if threshold == SIMILARITY_THRESHOLD and top_k == 1 else ""),
+                    str(top_k),
+                    str(matched),
+                    f"{matched / max(len(face_best), 1):.1%}",
+                    str(int(present.sum())),
+                    str(int((present & ~baseline).sum())),
+                    str(int((baseline & ~present).sum())),
+                ]
+            )
+    return header, rows
+
+
+def attendance_rows(
+    days: List[Tuple[date, np.ndarray]], subjects: List[str], threshold: float, top_k: int
+) -> Tuple[List[str], List[List[str]]]:
+    header = ["ID Number", "Last Name", "First Name", "Grade", "Day", "First Seen", "Last Seen", "Times Seen"]
+    rows = []
+    for day, events in days:
+        for subject, first, last, count in attendance(events, threshold, top_k):
+            try:
+                columns = subject_columns(SubjectRecord.from_string(subjects[subject]))
+            except ValueError:  # not in the usual format, keep the name as it is
+                columns = ["", subjects[subject], "", ""]
+            rows.append(
+                columns
+                + [
+                    day.isoformat(),
+                    datetime.fromtimestamp(first).strftime("%X"),
+                    datetime.fromtimestamp(last).strftime("%X"),
+                    str(count),
+                ]
+            )
+    return header, rows
+
+
+def main() -> None:
+    args = parse_arguments()
+    event_dir = Path(args.event_dir)
+    if any(not 1 <= top_k <= EVENT_TOP_K for top_k in args.top_k):
+        raise SystemExit(f"--top-k has to be between 1 and {EVENT_TOP_K}")
+    s_time = time.monotonic()
+    days = load_days(event_dir, args.start, args.end)
+    subjects = load_subjects(event_dir)
+    events = sum(len(day_events) for _, day_events in days)
+    if events == 0:
+        print(f"No events in {event_dir} in that time")
+        return
+    if args.report == "sweep":
+        thresholds = args.threshold or [round(threshold, 2) for threshold in np.arange(0.5, 0.96, 0.05)]
+        header, rows = sweep(days, len(subjects), thresholds, args.top_k)
+    else:
+        threshold = args.threshold[0] if args.threshold else SIMILARITY_THRESHOLD
+        header, rows = attendance_rows(days, subjects, threshold, args.top_k[0])
+    print(f"{args.report.title()} of {events} events from {days[0][0]} to {days[-1][0]}\n")
+    print_table(header, rows)
+    print(f"\n{len(rows)} rows in {time.monotonic() - s_time:.3f} Seconds")
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile, dialect="excel")
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from easyID.classes import clock
+from easyID.classes.clock import AcceleratedClock
+from easyID.classes.frame_source import SyntheticSource
+from easyID.classes.subject_registry import SubjectRegistry
+from easyID.threads.event_log_thread import EventLogThread
+from easyID.threads.exporters.export_to_spreadsheet import SpreadsheetExporter
+from easyID.threads.logging_thread import LoggingThread
+from easyID.threads.recognition_thread import RecognitionThread
+from easyID.threads.webcam_thread import WebcamThread
+from scripts.mock_compreface import start_mock_servers
+
+# Runs the webcam, recognition and logging threads headless for a long time, against a mock server with a synthetic
+# webcam and an accelerated clock, so minute boundaries and daily log files come around quickly.
+# Resource usage is sampled while it runs, the run fails if anything keeps growing. The gui isn't part of it.
+
+# smallest growth over the run that counts, so a few MB or a stray thread don't fail the run
+METRIC_TOLERANCES: Dict[str, float] = {
+    "rss_mb": 10,
+    "threads": 2,
+    "open_fds": 4,
+    "frame_queue": 2,
+    "logging_queue": 10,
+    "export_queue": 5,
+    "event_log_queue": 50,
+    "pending_minutes": 3,
+    "recognition_latency_ms": 50,
+    "export_latency_ms": 20,
+}
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--duration", help="Real seconds to run for", type=float, default=600)
+    parser.add_argument("--speed", help="How much faster than real time the clock runs", type=float, default=600)
+    parser.add_argument("--fps", help="Frames per second of the synthetic webcam", type=float, default=15)
+    parser.add_argument("--latency", help="Average mock server processing time in seconds", type=float, default=0.02)
+    parser.add_argument("--error-rate", help="Fraction of mock requests that fail", type=float, default=0.0)
+    parser.add_argument("--sample-interval", help="Real seconds between samples", type=float, default=5)
+    parser.add_argument("--warmup", help="Fraction of the run ignored for trends", type=float, default=0.2)
+    parser.add_argument(
+        "--threshold", help="Allowed growth over the run, as a fraction of the starting value", type=float, default=0.1
+    )
+    parser.add_argument(
+        "--output-dir", help="Where the logs are written, a temp dir by default", type=str, default=None
+    )
+    parser.add_argument("--output", help="Write the samples to this csv file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # not linux, peak instead of current
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+def open_fds() -> int:
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(fd_dir):
+            return len(os.listdir(fd_dir))
+    return -1
+
+
+def take_sample(
+    elapsed: float, webcam_thread: WebcamThread, recognition_thread: RecognitionThread, logging_thread: LoggingThread
+) -> Dict[str, float]:
+    latency = recognition_thread.rate_controller.latency
+    return {
+        "elapsed": elapsed,
+        "rss_mb": rss_mb(),
+        "threads": threading.active_count(),
+        "open_fds": open_fds(),
+        "frame_queue": len(webcam_thread.frame_queue),
+        "logging_queue": len(recognition_thread.logging_queue),
+        "export_queue": len(logging_thread.export_queue),
+        "event_log_queue": len(logging_thread.event_log_thread.queue) if logging_thread.event_log_thread else 0,
+        "pending_minutes": logging_thread.pending_minutes,
+        "recognition_latency_ms": latency * 1000 if latency is not None else 0.0,
+        "export_latency_ms": logging_thread.export_latency * 1000,
+    }
+
+
+def find_trends(samples: List[Dict[str, float]], warmup: float, threshold: float) -> List[str]:
+    """
+    Fits a line through every metric after the warmup, a metric fails when it grew by more than its tolerance and
+    more than threshold times its starting value over the run.
+    """
+    first = int(len(samples) * warmup)
+    samples = samples[first:]
+    if len(samples) < 3:
+        return []
+    elapsed = np.array([sample["elapsed"] for sample in samples])
+    failures = []
+    for metric, tolerance in METRIC_TOLERANCES.items():
+        values = np.array([sample[metric] for sample in samples])
+        slope, intercept = np.polyfit(elapsed, values, 1)
+        start = slope * elapsed[0] + intercept
+        growth = slope * (elapsed[-1] - elapsed[0])
+        if growth > tolerance and growth > threshold * abs(start):
+            failures.append(f"{metric} grew by {growth:.1f} ({start:.1f} -> {start + growth:.1f})")
+    return failures
+
+
+def main() -> None:
+    args = parse_arguments()
+    output_dir = Path(args.output_dir) if args.output_dir is not None else Path(tempfile.mkdtemp(prefix="easyID_soak_"))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    clock.set_clock(AcceleratedClock(args.speed))  # before anything reads the time
+    server = start_mock_servers([0], args.latency, error_rate=args.error_rate)[0]
+
+    webcam_thread = WebcamThread(SyntheticSource(fps=args.fps))
+    recognition_thread = RecognitionThread(
+        webcam_thread, Namespace(api_key="", host=[server.host], port=[server.port]), output_dir / "Spool"
+    )  # its own spool, the kiosk's spooled frames are left alone
+    subject_registry = SubjectRegistry(recognition_thread.endpoint_pool, output_dir / "subjects_cache.txt")
+    logging_thread = LoggingThread(
+        recognition_thread, subject_registry, SpreadsheetExporter(output_dir), EventLogThread(output_dir / "Events")
+    )
+    webcam_thread.start()
+    recognition_thread.start()
+    subject_registry.start()
+    logging_thread.start()
+    print(f"Soak test running for {args.duration:.0f}s at {args.speed:g}x, writing logs to {output_dir}")
+
+    samples: List[Dict[str, float]] = []
+    s_time = time.monotonic()
+    try:
+        while time.monotonic() - s_time < args.duration:
+            time.sleep(args.sample_interval)
+            sample = take_sample(time.monotonic() - s_time, webcam_thread, recognition_thread, logging_thread)
+            samples.append(sample)
+            print(
+                f"{clock.now().strftime('%Y-%m-%d %H:%M')} | RSS {sample['rss_mb']:.1f} MB | "
+                f"threads {sample['threads']:.0f} | fds {sample['open_fds']:.0f} | "
+                f"queues {sample['frame_queue']:.0f}/{sample['logging_queue']:.0f}/{sample['export_queue']:.0f} | "
+                f"pending {sample['pending_minutes']:.0f} | latency {sample['recognition_latency_ms']:.0f} ms"
+            )
+    except KeyboardInterrupt:
+        print("Stopping early")
+    finally:
+        logging_thread.stop()
+        recognition_thread.stop()
+        subject_registry.stop()
+        webcam_thread.stop()
+        server.shutdown()
+
+    if args.output is not None and len(samples) > 0:
+        with open(args.output, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(samples[0].keys()), dialect="excel")
+            writer.writeheader()
+            writer.writerows(samples)
+
+    log_files = sorted(output_dir.glob("easyID_log_*.csv"))
+    print(f"\n{len(log_files)} daily log files, {server.requests} recognize requests")
+    failures = find_trends(samples, args.warmup, args.threshold)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("PASS: nothing kept growing")
+
+
+if __name__ == "__main__":
+    main()
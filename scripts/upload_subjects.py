@@ -7,14 +7,21 @@ from compreface import CompreFace
 from compreface.collections import FaceCollection, Subjects
 from compreface.service import RecognitionService
 
+from easyID.classes.endpoint_pool import EndpointPool
 from easyID.classes.subject_record import SubjectPathRecord
 from easyID.settings import CF_OPTIONS, DETECTION_PROBABILITY_THRESHOLD, SELF_SIGNED_CERT_DIR
 
 
 class UploadSubjects:
-    def __init__(self, api_key: str, host: str, port: str) -> None:
+    def __init__(self, api_key: str, hosts: List[str], ports: List[str]) -> None:
         if SELF_SIGNED_CERT_DIR is not None:  # add self-signed certificate
             os.environ["REQUESTS_CA_BUNDLE"] = str(SELF_SIGNED_CERT_DIR)
+        # the servers share one database, so we only need to upload to the first one that's up
+        endpoint = EndpointPool(api_key, hosts, ports).first_reachable()
+        if endpoint is None:
+            raise ConnectionError("None of the CompreFace servers are reachable")
+        host, port = endpoint.client.host, endpoint.client.port
+        print(f"Uploading to {host}:{port}")
         # setup CompreFace
         self.compre_face: CompreFace = CompreFace(host, port, CF_OPTIONS)  # init compreface
         self.recognition: RecognitionService = self.compre_face.init_face_recognition(